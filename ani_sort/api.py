@@ -1,4 +1,144 @@
-import requests
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+from ani_sort import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+# 需要退避重试的状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶限流器：平均每秒 rate 个请求，允许 capacity 个突发"""
+
+    def __init__(self, rate: float, capacity: int | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    """共享的 HTTP 客户端：连接池复用、限流，并对 429/5xx 与网络错误指数退避重试"""
+
+    def __init__(
+        self,
+        connect_timeout: float = 10,
+        read_timeout: float = 60,
+        retries: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 30,
+        rate_limit: float | None = None,
+        burst: int | None = None,
+        pool_size: int = 10,
+        logger=None,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.logger = logger or logging.getLogger("AniSort")
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """首次发出请求时才导入 requests 并建立连接池（缓存命中时不需要）"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _delay(self, attempt: int, res=None) -> float:
+        if res is not None and (retry_after := res.headers.get("Retry-After")):
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = self.backoff * 2**attempt
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        import requests
+
+        session = self.session
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                res = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self._delay(attempt)
+                self.logger.warning(
+                    f"{method} {url} failed: {e}, retry in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+
+            if res.status_code in RETRY_STATUS and attempt < self.retries:
+                delay = self._delay(attempt, res)
+                self.logger.warning(
+                    f"{method} {url} returned {res.status_code}, retry in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+
+            res.raise_for_status()
+            return res
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("POST", url, **kwargs)
+
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name: str, config=None) -> HttpClient:
+    """按名称（tmdb / ai）获取进程内共享的客户端，配置变化时重建"""
+    settings = dict(getattr(config.http, name)) if config is not None else {}
+    key = (name, tuple(sorted(settings.items())))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = HttpClient(**settings)
+        return _clients[key]
 
 
 def call_tmdb(
@@ -7,30 +147,45 @@ def call_tmdb(
     params: dict | None = None,
     proxies: dict | None = None,
     logger=None,
+    cache=None,
+    client: HttpClient | None = None,
 ) -> dict:
-    params = params or {}
+    params = {**(params or {}), "language": "zh-CN"}
     proxies = proxies or {}
+    client = client or get_http_client("tmdb")
+
+    if cache is not None and (data := cache.get(url, params)) is not None:
+        metrics.CACHE_LOOKUPS.inc(cache="tmdb", result="hit")
+        if logger:
+            logger.debug(f"TMDB cache hit for {url} with {params}")
+        return data
+    if cache is not None:
+        metrics.CACHE_LOOKUPS.inc(cache="tmdb", result="miss")
+
     if logger:
         logger.debug(f"TMDB request to {url} with {params}")
 
     try:
-        res = requests.get(
-            url=url,
-            params={**params, "language": "zh-CN", "api_key": api_key},
+        res = client.get(
+            url,
+            params={**params, "api_key": api_key},
             proxies=proxies,
             headers={"accept": "application/json"},
-            timeout=60,
         )
-        res.raise_for_status()
-        return res
+        data = res.json()
     except Exception as e:
         raise Exception(f"连接 TMDB 时发生错误：{e}")
 
+    if cache is not None:
+        cache.set(url, params, data)
+    return data
+
 
-def call_ai(api_key: str, content: str) -> str:
+def call_ai(api_key: str, content: str, client: HttpClient | None = None) -> str:
+    client = client or get_http_client("ai")
     try:
-        res = requests.post(
-            url="https://api.deepseek.com/chat/completions",
+        res = client.post(
+            "https://api.deepseek.com/chat/completions",
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
@@ -40,7 +195,6 @@ def call_ai(api_key: str, content: str) -> str:
                 "messages": [{"role": "user", "content": content}],
             },
         )
-        res.raise_for_status()
         return res.json()["choices"][0]["message"]["content"]
     except Exception as e:
         raise Exception(f"连接 DeepSeek 时发生错误：{e}")
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from ani_sort.api import get_http_client
+
+
+ARTWORK_DIR = os.path.join(os.path.dirname(__file__), "../data/artwork")
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p"
+
+# 尺寸: (TMDB 图片规格, 缩略图宽度；None 表示直接使用 TMDB 图片)
+VARIANTS = {
+    "poster": ("w500", None),
+    "thumb": ("w500", 185),
+}
+# 没有 Pillow 时缩略图使用的 TMDB 规格
+FALLBACK_SIZES = {185: "w185"}
+
+
+def tmdb_url(tmdb_path: str, variant: str = "poster") -> str:
+    """对应尺寸的 TMDB 图片地址（本地缓存不可用时使用）"""
+    size, width = VARIANTS.get(variant, VARIANTS["poster"])
+    return f"{TMDB_IMAGE_BASE}/{FALLBACK_SIZES.get(width, size)}{tmdb_path}"
+
+
+def _pillow():
+    """按需导入 Pillow；未安装时直接下载 TMDB 的小尺寸图片"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class ArtworkStore:
+    """海报等图片的本地缓存
+
+    文件以内容哈希命名（相同图片只存一份），索引记录 (TMDB 路径, 尺寸) -> 哈希；
+    总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+
+    def __init__(
+        self,
+        root: str | Path = ARTWORK_DIR,
+        max_bytes: int = 512 * 1024 * 1024,
+        proxies: dict | None = None,
+        logger=None,
+        config=None,
+    ) -> None:
+        self.root = Path(root)
+        self.config = config  # 下载时使用 http.tmdb 的限流与重试设置
+        self.max_bytes = max_bytes
+        self.proxies = proxies or {}
+        self.logger = logger or logging.getLogger("AniSort")
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            self.root / "index.db", check_same_thread=False, timeout=30
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artwork (
+                tmdb_path TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (tmdb_path, variant)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def file_path(self, digest: str, ext: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{ext}"
+
+    def lookup(self, tmdb_path: str, variant: str) -> Path | None:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT digest, ext FROM artwork WHERE tmdb_path = ? AND variant = ?",
+                (tmdb_path, variant),
+            ).fetchone()
+            if row is None:
+                return None
+            path = self.file_path(*row)
+            if not path.exists():
+                self.conn.execute(
+                    "DELETE FROM artwork WHERE tmdb_path = ? AND variant = ?",
+                    (tmdb_path, variant),
+                )
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE artwork SET last_used = ? WHERE tmdb_path = ? AND variant = ?",
+                (time.time(), tmdb_path, variant),
+            )
+            self.conn.commit()
+            return path
+
+    def _download(self, tmdb_path: str, size: str) -> bytes:
+        client = get_http_client("tmdb", self.config)
+        res = client.get(f"{TMDB_IMAGE_BASE}/{size}{tmdb_path}", proxies=self.proxies)
+        return res.content
+
+    def _render(self, tmdb_path: str, variant: str) -> bytes:
+        size, width = VARIANTS[variant]
+        if width is None:
+            return self._download(tmdb_path, size)
+        if (Image := _pillow()) is None:
+            return self._download(tmdb_path, FALLBACK_SIZES.get(width, size))
+
+        source = self.lookup(tmdb_path, "poster")
+        data = source.read_bytes() if source else self._download(tmdb_path, size)
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((width, width * 2))
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+    def _store(self, tmdb_path: str, variant: str, data: bytes) -> Path:
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        ext = Path(tmdb_path).suffix.lower() or ".jpg"
+        if VARIANTS[variant][1] is not None and _pillow() is not None:
+            ext = ".jpg"
+        path = self.file_path(digest, ext)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{threading.get_ident()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO artwork VALUES (?, ?, ?, ?, ?, ?)",
+                (tmdb_path, variant, digest, ext, len(data), time.time()),
+            )
+            self.conn.commit()
+        self.evict()
+        return path
+
+    def get(self, tmdb_path: str, variant: str = "poster") -> Path | None:
+        """返回本地图片路径，未缓存时下载（并生成缩略图）"""
+        if not tmdb_path or variant not in VARIANTS:
+            return None
+        if (path := self.lookup(tmdb_path, variant)) is not None:
+            return path
+        try:
+            data = self._render(tmdb_path, variant)
+        except Exception as e:
+            self.logger.warning(f"Failed to fetch artwork {tmdb_path} ({variant}): {e}")
+            return None
+        return self._store(tmdb_path, variant, data)
+
+    def prefetch(self, *tmdb_paths: str | None) -> None:
+        """整理时预先下载海报与缩略图"""
+        for tmdb_path in filter(None, tmdb_paths):
+            for variant in VARIANTS:
+                self.get(tmdb_path, variant)
+
+    def evict(self) -> None:
+        """按最近使用时间淘汰，直到文件总大小不超过上限"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT digest, ext, MAX(size), MAX(last_used) FROM artwork "
+                "GROUP BY digest, ext ORDER BY MAX(last_used)"
+            ).fetchall()
+            total = sum(size for _, _, size, _ in rows)
+            for digest, ext, size, _ in rows:
+                if total <= self.max_bytes:
+                    break
+                self.file_path(digest, ext).unlink(missing_ok=True)
+                self.conn.execute("DELETE FROM artwork WHERE digest = ?", (digest,))
+                total -= size
+            self.conn.commit()
+
+
+_store: ArtworkStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_artwork_store(config=None) -> ArtworkStore | None:
+    """获取进程内共享的图片缓存，配置中关闭时返回 None"""
+    global _store
+    if config is not None and not config.artwork.enabled:
+        return None
+    with _store_lock:
+        if _store is None:
+            if config is not None:
+                _store = ArtworkStore(
+                    config.artwork.dir,
+                    config.artwork.size_mb * 1024 * 1024,
+                    proxies=config.general.proxies,
+                    config=config,
+                )
+            else:
+                _store = ArtworkStore()
+    return _store
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "../data/cache.db")
+
+# 各类接口的缓存时间（秒）
+DEFAULT_TTL = {
+    "search": 24 * 3600,  # /search/*
+    "details": 7 * 24 * 3600,  # /tv/{id}、/movie/{id}
+    "season": 30 * 24 * 3600,  # /tv/{id}/season/{n}/...
+    "negative": 6 * 3600,  # 空搜索结果
+}
+
+# 不参与缓存键计算的参数
+IGNORED_PARAMS = {"api_key"}
+
+
+def endpoint_kind(url: str) -> str:
+    """按 URL 路径判断接口类型，用于选择 TTL"""
+    parts = [p for p in urlsplit(url).path.split("/") if p]
+    if parts and parts[0].isdigit():  # 去掉 API 版本号 /3/
+        parts = parts[1:]
+    if not parts:
+        return "details"
+    if parts[0] == "search":
+        return "search"
+    if "season" in parts:
+        return "season"
+    return "details"
+
+
+def normalize_params(params: dict | None) -> list:
+    """规范化请求参数：去掉密钥，统一大小写与空白，按键排序"""
+    normalized = []
+    for k, v in (params or {}).items():
+        if k in IGNORED_PARAMS or v is None:
+            continue
+        v = " ".join(str(v).split())
+        if k == "query":
+            v = v.casefold()
+        normalized.append((k, v))
+    return sorted(normalized)
+
+
+def is_negative(kind: str, data: dict) -> bool:
+    return kind == "search" and not data.get("results")
+
+
+class TMDBCache:
+    """TMDB 响应的 SQLite 持久化缓存
+
+    键为 URL + 规范化参数，按接口类型设置 TTL，空搜索结果单独以较短 TTL 缓存。
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: dict | None = None) -> None:
+        self.path = path
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tmdb_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body TEXT NOT NULL,
+                negative INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_tmdb_cache_expires ON tmdb_cache (expires_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url: str, params: dict | None = None) -> str:
+        return json.dumps(
+            [url.rstrip("/"), normalize_params(params)], ensure_ascii=False
+        )
+
+    def get(self, url: str, params: dict | None = None) -> dict | None:
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, negative FROM tmdb_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if row[1]:
+                self.negative_hits += 1
+        return json.loads(row[0])
+
+    def set(self, url: str, params: dict | None, data: dict) -> None:
+        kind = endpoint_kind(url)
+        negative = is_negative(kind, data)
+        now = time.time()
+        expires_at = now + self.ttl["negative" if negative else kind]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tmdb_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.make_key(url, params),
+                    url,
+                    json.dumps(data, ensure_ascii=False),
+                    int(negative),
+                    now,
+                    expires_at,
+                ),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM tmdb_cache WHERE expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tmdb_cache")
+            self._conn.commit()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+        }
+
+
+def normalize_stem(stem: str) -> str:
+    """规范化文件夹名：统一大小写、分隔符与空白"""
+    return " ".join(stem.replace("_", " ").replace(".", " ").split()).casefold()
+
+
+class AIMemo:
+    """AI 调用结果的持久化记忆表
+
+    键为提示词、上下文与规范化文件夹名的内容哈希，结果不过期。
+    """
+
+    def __init__(self, path: str = CACHE_PATH) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ai_memo (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, name: str, context: str = "") -> str:
+        raw = "\x00".join([prompt.strip(), context.strip(), normalize_stem(name)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, name: str, context: str = "") -> str | None:
+        key = self.make_key(prompt, name, context)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM ai_memo WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, prompt: str, name: str, answer: str, context: str = "") -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_memo VALUES (?, ?, ?, ?)",
+                (self.make_key(prompt, name, context), name, answer, time.time()),
+            )
+            self._conn.commit()
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_tmdb_cache: TMDBCache | None = None
+_singleton_lock = threading.Lock()
+
+
+def get_tmdb_cache(config=None) -> TMDBCache | None:
+    """获取进程内共享的 TMDB 缓存，配置中关闭缓存时返回 None"""
+    global _tmdb_cache
+    if config is not None and not config.tmdb.cache:
+        return None
+    with _singleton_lock:
+        if _tmdb_cache is None:
+            _tmdb_cache = TMDBCache(ttl=config.tmdb.cache_ttl if config else None)
+    return _tmdb_cache
+
+
+_ai_memo: AIMemo | None = None
+
+
+def get_ai_memo(config=None) -> AIMemo | None:
+    """获取进程内共享的 AI 记忆表，配置中关闭时返回 None"""
+    global _ai_memo
+    if config is not None and not config.ai.memo:
+        return None
+    with _singleton_lock:
+        if _ai_memo is None:
+            _ai_memo = AIMemo()
+    return _ai_memo
@@ -1,12 +1,23 @@
 import os
+import threading
 import yaml
 from dotenv import load_dotenv
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, PrivateAttr, validator
+from ani_sort.patterns import PatternEngine
+from ani_sort.artwork import ARTWORK_DIR
+
+SETTINGS_PATH = "config/settings.yaml"
+PATTERNS_PATH = "config/pattern_rules.yaml"
 
 
 class TMDBConfig(BaseModel):
     api: str | None = None
     manual: bool = False
+    cache: bool = True
+    cache_ttl: dict = {}
+    resolver: str = "network"  # network / local（先查本地标题索引）
+    index_path: str = "data/tmdb_index.db"
+    concurrency: int = 8  # 批量整理时同时解析元数据的文件夹数
 
 
 class AIConfig(BaseModel):
@@ -15,6 +26,66 @@ class AIConfig(BaseModel):
     call: bool = False
     prompt1: str
     prompt2: str
+    memo: bool = True
+    batch_size: int = 20
+
+
+class HTTPClientConfig(BaseModel):
+    connect_timeout: float = 10
+    read_timeout: float = 60
+    retries: int = 3
+    backoff: float = 1.0
+    max_backoff: float = 30
+    rate_limit: float | None = None  # 每秒请求数，None 为不限流
+    burst: int | None = None
+    pool_size: int = 10
+
+
+class HTTPConfig(BaseModel):
+    tmdb: HTTPClientConfig = HTTPClientConfig(rate_limit=40, burst=20)
+    ai: HTTPClientConfig = HTTPClientConfig(read_timeout=300, retries=2, backoff=2.0)
+
+
+class SubsetConfig(BaseModel):
+    workers: int = 1  # 并行处理的 ASS 文件数
+    cache: bool = True  # 字体与字形集合相同的字幕复用子集化结果
+    cache_dir: str = "data/font_cache"
+    cache_size_mb: int = 1024
+
+
+class ArtworkConfig(BaseModel):
+    enabled: bool = True  # 整理时下载海报，图库从本地提供
+    dir: str = ARTWORK_DIR  # 默认在项目目录下，与工作目录无关
+    size_mb: int = 512  # 超出后按最近使用时间淘汰
+
+
+class WatcherConfig(BaseModel):
+    settle_seconds: float = 60  # 文件夹大小与修改时间保持不变多久后视为写入完成
+    interval: float = 5  # 检查间隔
+    mode: str = "auto"  # auto / native / polling
+    poll_interval: float = 30  # 轮询模式下扫描监听目录的间隔
+
+
+class LinkConfig(BaseModel):
+    workers: int = 0  # 并发链接的目录分块数，0 表示网络文件系统上 8、本地 1
+    cross_device: str = "copy"  # 跨设备时 copy（reflink 或复制）/ fail
+
+
+class LibraryConfig(BaseModel):
+    enabled: bool = True  # 先在已整理的番剧中模糊匹配文件夹名
+    threshold: float = 0.8  # trigram 相似度阈值（0~1）
+
+
+class QueueConfig(BaseModel):
+    workers: int = 2  # Web 服务同时执行的整理任务数
+    poll_interval: float = 2.0
+    lease_seconds: float = 300  # 租约时长，worker 每 1/3 租约续约一次
+    max_attempts: int = 3
+
+
+class HistoryConfig(BaseModel):
+    max_size_mb: int = 16  # 超过后压缩归档
+    keep: int = 10  # 保留的归档数
 
 
 class GeneralConfig(BaseModel):
@@ -26,6 +97,7 @@ class GeneralConfig(BaseModel):
     proxies: dict
     original_archive_dir: str
     watch_folder: str
+    incremental: bool = True
 
 
 class AppConfig(BaseModel):
@@ -33,8 +105,26 @@ class AppConfig(BaseModel):
     features: dict
     tmdb: TMDBConfig
     ai: AIConfig
+    http: HTTPConfig = HTTPConfig()
+    subset: SubsetConfig = SubsetConfig()
+    history: HistoryConfig = HistoryConfig()
+    queue: QueueConfig = QueueConfig()
+    watcher: WatcherConfig = WatcherConfig()
+    artwork: ArtworkConfig = ArtworkConfig()
+    link: LinkConfig = LinkConfig()
+    library: LibraryConfig = LibraryConfig()
     ignore_exts: list
     patterns: list[dict]
+    pattern_order: str = "file"  # file: 按书写顺序匹配；priority: 按 priority 升序
+
+    _ruleset: PatternEngine | None = PrivateAttr(default=None)
+
+    @property
+    def ruleset(self) -> PatternEngine:
+        """编译后的只读规则集，每个配置对象只编译一次"""
+        if self._ruleset is None:
+            self._ruleset = PatternEngine(self.patterns, self.pattern_order)
+        return self._ruleset
 
 
 @validator("default_output", "original_archive_dir")
@@ -42,7 +132,28 @@ def ensure_trailing_slash(cls, v):
     return v.rstrip("/") + "/"
 
 
-def load_config():
+_cache: dict = {"key": None, "conf": None}
+_cache_lock = threading.Lock()
+
+
+def _config_mtimes() -> tuple:
+    return tuple(os.stat(p).st_mtime_ns for p in (SETTINGS_PATH, PATTERNS_PATH))
+
+
+def load_config(force: bool = False) -> AppConfig:
+    """加载配置；两个 YAML 文件均未修改时直接返回上次的结果"""
+    key = _config_mtimes()
+    with _cache_lock:
+        if not force and _cache["key"] == key:
+            return _cache["conf"]
+
+        conf = _load_config()
+        conf.ruleset  # 加载时即编译规则
+        _cache.update(key=key, conf=conf)
+        return conf
+
+
+def _load_config() -> AppConfig:
     load_dotenv(".env")
 
     def _env_expand(value):
@@ -50,10 +161,10 @@ def load_config():
             return os.getenv(value.split()[1])
         return value
 
-    with open("config/settings.yaml", "r") as f:
+    with open(SETTINGS_PATH, "r") as f:
         settings = yaml.safe_load(f)
 
-    with open("config/pattern_rules.yaml", "r", encoding="utf-8") as f:
+    with open(PATTERNS_PATH, "r", encoding="utf-8") as f:
         pattern_yaml = yaml.load(f, Loader=yaml.FullLoader)
 
     # 只取 "patterns" 键，避免传整个 dict
@@ -64,5 +175,9 @@ def load_config():
         for k, v in settings[section].items():
             settings[section][k] = _env_expand(v)
 
-    conf = AppConfig(**settings, patterns=patterns)
+    conf = AppConfig(
+        **settings,
+        patterns=patterns,
+        pattern_order=pattern_yaml.get("order", "file"),
+    )
     return conf
@@ -1,13 +1,12 @@
-import os
 from ani_sort.utils import sanitize_filename, get_all_files
-from ani_sort.metadata import extract_groups, get_ani_info, get_season_poster
-from ani_sort.subset import subset_ass_fonts
+from ani_sort.metadata import extract_groups, resolve_metadata
+from ani_sort.history import get_history
+from ani_sort.manifest import SeriesManifest, fingerprint, rules_digest
+from ani_sort import linker, metrics
 from pathlib import Path
 from typing import Union
-import re
 import logging
 from datetime import datetime
-import json
 import uuid
 
 
@@ -31,13 +30,22 @@ class AniSort(object):
         parent_dir: Union[str, Path] = None,
         config=None,
         logger=None,
+        ani_info: dict | None = None,
+        table: dict | None = None,
     ) -> None:
+        """ani_info: 预先解析好的元数据（见 ani_sort.resolver），省略时在此查询
+        table: 源文件 -> 相对番剧目录的目标路径（或 "ignore"），执行计划时使用；
+               省略时扫描 path 并按规则生成
+        """
 
         self.path: Path = Path(path.strip("\"'")) if isinstance(path, str) else path
         self.config = config
         self.logger = logger or logging.getLogger(__name__)
 
-        self.ani_info: dict = get_ani_info(self.path.stem, self.config, self.logger)
+        if ani_info is None:
+            with metrics.stage("metadata"):
+                ani_info = resolve_metadata(self.path.stem, self.config, self.logger)
+        self.ani_info: dict = ani_info
         self.season: int = self.ani_info["season"]
         self.ani_name: str = (
             f'{self.ani_info["name"]} ({self.ani_info["date"]})'.replace(
@@ -50,9 +58,7 @@ class AniSort(object):
         self.media_type = self.ani_info["media_type"]
         self.poster_path = self.ani_info["poster_path"]
         if self.media_type == "tv":
-            self.season_poster_path: str = get_season_poster(
-                self.tmdb_id, self.season, self.config, self.logger
-            )
+            self.season_poster_path: str = self.ani_info.get("season_poster_path")
 
         if parent_dir is None or str(parent_dir).strip() == "":
             parent_dir = Path(self.config.general.default_output)
@@ -63,13 +69,46 @@ class AniSort(object):
             f"{str(parent_dir).rstrip('/')}/{sanitize_filename(self.ani_name)}"
         )
 
-        self.config.patterns: dict = [
-            {**p, "regex": re.compile(p["regex"])} for p in self.config.patterns
-        ]
+        self.rules = self.config.ruleset
 
-        self.table: dict = {
-            str(file): self.normalize(file) for file in get_all_files(self.path)
-        }
+        self.manifest = None
+        if self.config.general.incremental:
+            self.manifest = SeriesManifest(self.parent_dir, rules_digest(self.config))
+
+        # 指纹与清单一致的文件沿用上次的目标路径，不再解析与链接
+        self.table: dict = {}
+        self.fingerprints: dict = {}
+        self.unchanged: set = set()
+        if table is None:
+            with metrics.stage("scan"):
+                files = get_all_files(self.path)
+        else:
+            files = [Path(src) for src in table]
+        with metrics.stage("normalize"):
+            for file in files:
+                src = str(file)
+                planned = None
+                if table is not None:
+                    planned = table[src]
+                    if planned != "ignore":
+                        planned = f"{self.parent_dir}/{planned}"
+                try:
+                    fp = self.fingerprints[src] = fingerprint(file)
+                except OSError:
+                    fp = None
+                dest = self.manifest.lookup(src, fp) if self.manifest and fp else None
+                if dest and (planned is None or dest == planned):
+                    self.table[src] = dest
+                    self.unchanged.add(src)
+                else:
+                    self.table[src] = planned or self.normalize(file)
+
+        # 执行计划时计划之外的文件不视为消失（计划后发生变化的文件已被排除）
+        self.disappeared: list = []
+        if self.manifest and table is None:
+            self.disappeared = self.manifest.disappeared(self.path, self.table)
+            for src in self.disappeared:
+                self.logger.warning(f"Source disappeared since last run: {src}")
 
         self.task_id = uuid.uuid4().hex[:8]
         self.start_time = datetime.now()
@@ -88,33 +127,7 @@ class AniSort(object):
         """解析番剧文件名
         name: 番剧文件名
         """
-        for p in self.config.patterns:
-            if match := p["regex"].search(name):
-                if p["type"] == "SE_EP":
-                    season, match_2 = int(match[1]), match[2]
-                else:
-                    match_2: str = match[1] if p["type"] == "EP" else match[2] or "1"
-                    season: int = self.season
-
-                # 处理第0集的情况
-                if (match2 := re.match(r"(\d+)(?:[v|_]\d+){0,1}", match_2)) and int(
-                    match2[1]
-                ) == 0:
-                    return None
-
-                return {
-                    **p,
-                    "season": f"{season:02d}",
-                    "episode": (
-                        f"{int(match_2):02d}"
-                        if match_2.isdigit()
-                        else match_2.split("v")[0]
-                    ),
-                    "raw_match": match.group(),
-                    "match_1": match[1],
-                }
-
-        return None
+        return self.rules.parse(name, self.season)
 
     def normalize(self, path: Path) -> str:
         """获取文件规范化命名
@@ -157,9 +170,24 @@ class AniSort(object):
 
         return f"{self.parent_dir}/Unknown_Files/{path.name}"
 
+    @metrics.timed("subset")
     def subset_ass(self, dryrun=False) -> None:
-        subset_ass_fonts(self.parent_dir, logger=self.logger)
+        from ani_sort.subset import subset_ass_fonts
+        from ani_sort.fonts import FontCache
+
+        options = self.config.subset
+        cache = None
+        if options.cache:
+            cache = FontCache(options.cache_dir, options.cache_size_mb * 1024 * 1024)
+            cache.purge_staging()
+        subset_ass_fonts(
+            self.parent_dir,
+            logger=self.logger,
+            workers=options.workers,
+            cache=cache,
+        )
 
+    @metrics.timed("move")
     def move_original_folder(self, dryrun=False) -> None:
         target_root = Path(self.config.general.original_archive_dir)
         target_root.mkdir(exist_ok=True, parents=True)
@@ -190,93 +218,133 @@ class AniSort(object):
             "duration": duration,
         }
 
-        history_file = Path("tasks/history.json")
-        history_file.parent.mkdir(exist_ok=True)
-        data = []
-
         try:
-            if history_file.exists():
-                data = json.loads(history_file.read_text(encoding="utf-8"))
-        except Exception as e:
-            self.logger.warning(f"Failed to read task history: {e}")
-
-        data.append(entry)
-
-        try:
-            history_file.write_text(json.dumps(data, indent=2, ensure_ascii=False))
-            self.logger.debug(
-                f"[TASK {self.task_id}] Logged task result to {history_file}"
-            )
+            get_history(self.config).append(entry)
+            self.logger.debug(f"[TASK {self.task_id}] Logged task result")
         except Exception as e:
             self.logger.error(f"Failed to write task log: {e}")
 
-    def _handle_link(self, src_path, dest_path, ext):
-        try:
-            os.link(src_path, dest_path)
+    def _handle_link(self, src_path, dest_path, ext, method, error=None):
+        """记录链接引擎对单个文件的处理结果，失败时返回 False"""
+        if method == linker.FAILED:
+            self.logger.error(
+                f"WARN: Cannot create hard link for {src_path.name} Error: {error}"
+            )
+            self.logger.error(f"[TASK {self.task_id}] Failed: {error}")
+            metrics.FAILURES.inc(kind="link")
+            self._write_task_log(status="failed")
+            return False
+        if method in (linker.REFLINKED, linker.COPIED):
+            # 源与目标不在同一设备，无法硬链接
+            self.logger.warning(
+                f"Arrange: [{ext}] {src_path.name} ({method.capitalize()}, "
+                f"cross-device)\n => {dest_path}"
+            )
+            metrics.CROSS_DEVICE.inc(method=method)
+        else:
             self.logger.info(
                 f"Arrange: [{ext}] {src_path.name} (Linked)\n => {dest_path}"
             )
-        except Exception as e:
-            self.logger.exception(
-                f"WARN: Cannot create hard link for {src_path.name} Error: {e}"
-            )
-            self.logger.error(f"[TASK {self.task_id}] Failed: {e}")
-            self._write_task_log(status="failed")
+        return True
 
     def process(self, dryrun=False, move=False) -> None:
         # return
-        dest_dirs: dict = {Path(dest).parent for dest in self.table.values()}
-        for d in dest_dirs:
+        changed = {
+            src: dest for src, dest in self.table.items() if src not in self.unchanged
+        }
+        if self.unchanged:
+            self.logger.info(
+                f"[TASK {self.task_id}] {len(self.unchanged)} unchanged file(s) "
+                f"skipped, {len(changed)} new or changed"
+            )
+
+        linked = ignored = exists = 0
+        with metrics.stage("link"):
+            dest_dirs: dict = {
+                Path(dest).parent for dest in changed.values() if dest != "ignore"
+            }
+            # 目录由链接引擎按需创建，按目标目录分组批量链接
+            results: dict = {}
             if dryrun:
-                self.logger.debug(f"[DRYRUN] Would create directory: {d}")
+                for d in dest_dirs:
+                    self.logger.debug(f"[DRYRUN] Would create directory: {d}")
             else:
-                d.mkdir(parents=True, exist_ok=True)
+                engine = linker.LinkEngine.for_path(self.parent_dir, self.config.link)
+                results = engine.run(
+                    [(src, dest) for src, dest in changed.items() if dest != "ignore"]
+                )
 
-        for src, dest in self.table.items():
-            src_path = Path(src)
-            dest_path = Path(dest)
-            ext = src_path.suffix.upper()
+            for src, dest in changed.items():
+                src_path = Path(src)
+                dest_path = Path(dest)
+                ext = src_path.suffix.upper()
 
-            if dest == "ignore":
-                self.logger.debug(f"Ignore [{ext}] : {src_path}\n ")
-            elif not dest_path.exists():
-                if dryrun:
+                if dest == "ignore":
+                    ignored += 1
+                    self.logger.debug(f"Ignore [{ext}] : {src_path}\n ")
+                elif dryrun and not dest_path.exists():
                     self.logger.debug(
                         f"[DRYRUN] [{ext}] Would link: {src_path}\n => {dest_path}"
                     )
+                    continue
+                elif not dryrun and results[src][0] != linker.EXISTS:
+                    if not self._handle_link(src_path, dest_path, ext, *results[src]):
+                        continue
+                    linked += 1
                 else:
-                    self._handle_link(src_path, dest_path, ext)
-            else:
-                self.table[src] = src_path.name
-                self.logger.info(f"Skipped: Target file {dest_path} alreday exists.")
-
-        if self.config.general.ignore_file:
-            for root in Path(self.parent_dir).rglob("*/"):
-                if root.name in ["Interviews", "Other", "Unknown_Files"]:
-                    if dryrun:
-                        self.logger.debug(f"[DRYRUN] Would write .ignore in: {root}")
-                    else:
-                        (root / ".ignore").write_text("", encoding="utf-8")
-
-        if self.config.general.comparison_table:
-            if dryrun:
-                self.logger.debug(
-                    f"[DRYRUN] Would append Comparison_Table.txt in {self.parent_dir}"
-                )
-            else:
-                with open(
-                    f"{self.parent_dir}/Comparison_Table.txt", "a", encoding="utf-8"
-                ) as file:
-                    file.write(
-                        "\n"
-                        + "\n\n".join(
-                            "{}\n└── {}".format(
-                                "/".join(Path(v).parts[-2:]), Path(k).name
+                    exists += 1
+                    changed[src] = src_path.name
+                    self.logger.info(
+                        f"Skipped: Target file {dest_path} alreday exists."
+                    )
+
+                if self.manifest and src in self.fingerprints:
+                    self.manifest.record(src, self.fingerprints[src], dest)
+
+            if self.config.general.ignore_file:
+                for root in dest_dirs:
+                    if root.name in ["Interviews", "Other", "Unknown_Files"]:
+                        if dryrun:
+                            self.logger.debug(
+                                f"[DRYRUN] Would write .ignore in: {root}"
                             )
-                            for k, v in self.table.items()
-                            if v != "ignore"
-                        )
+                        elif root.is_dir():
+                            (root / ".ignore").write_text("", encoding="utf-8")
+
+        # 计数器在任务结束时一次性累加，避免逐个文件加锁
+        metrics.LINKS_CREATED.inc(linked)
+        metrics.FILES_SKIPPED.inc(len(self.unchanged), reason="unchanged")
+        metrics.FILES_SKIPPED.inc(exists, reason="exists")
+        metrics.FILES_SKIPPED.inc(ignored, reason="ignored")
+
+        with metrics.stage("table"):
+            if self.config.general.comparison_table and any(
+                v != "ignore" for v in changed.values()
+            ):
+                if dryrun:
+                    self.logger.debug(
+                        f"[DRYRUN] Would append Comparison_Table.txt in {self.parent_dir}"
                     )
+                else:
+                    with open(
+                        f"{self.parent_dir}/Comparison_Table.txt", "a", encoding="utf-8"
+                    ) as file:
+                        file.write(
+                            "\n"
+                            + "\n\n".join(
+                                "{}\n└── {}".format(
+                                    "/".join(Path(v).parts[-2:]), Path(k).name
+                                )
+                                for k, v in changed.items()
+                                if v != "ignore"
+                            )
+                        )
+
+            if self.manifest and not dryrun:
+                try:
+                    self.manifest.save()
+                except OSError as e:
+                    self.logger.warning(f"Failed to write manifest: {e}")
 
         end_time = datetime.now()
         duration = (end_time - self.start_time).total_seconds()
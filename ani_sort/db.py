@@ -7,8 +7,13 @@ from sqlalchemy import (
     Text,
     DateTime,
     Boolean,
+    JSON,
     ForeignKey,
     UniqueConstraint,
+    Index,
+    text,
+    event,
+    inspect,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime
@@ -17,9 +22,26 @@ import os
 Base = declarative_base()
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "../data/anisort.db")
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
+engine = create_engine(f"sqlite:///{DB_PATH}", echo=False, connect_args={"timeout": 30})
 SessionLocal = sessionmaker(bind=engine)
 
+# 每个连接建立时设置：WAL 允许读写并发，busy_timeout 让写冲突等待而不是直接报错
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,
+    "temp_store": "MEMORY",
+    "cache_size": -16000,  # 约 16 MB
+}
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _):
+    cursor = dbapi_conn.cursor()
+    for key, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {key}={value}")
+    cursor.close()
+
 
 class Anime(Base):
     __tablename__ = "anime"
@@ -30,7 +52,8 @@ class Anime(Base):
     name = Column(String, nullable=False)
     season = Column(Integer, default=1)
     season_desc = Column(String)
-    tmdb_id = Column(Integer)
+    tmdb_id = Column(Integer, index=True)
+    media_type = Column(String)  # tv / movie，旧记录为空，不参与番剧库匹配
     poster_path = Column(String, nullable=True)
     group_name = Column(String)
     orig_path = Column(String)
@@ -52,8 +75,9 @@ class Task(Base):
     started_at = Column(DateTime, default=datetime.now)
     ended_at = Column(DateTime)
 
-    status = Column(String)
+    status = Column(String, index=True)
     error_msg = Column(String)
+    timings = Column(JSON)  # 各阶段耗时（秒），见 ani_sort.metrics
 
     anime = relationship("Anime", back_populates="tasks")
 
@@ -65,8 +89,35 @@ class WatchedFolder(Base):
     detected_at = Column(DateTime, default=datetime.now)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)
     status = Column(
-        String, default="detected"
-    )  # detected, processing, processed, removed
+        String, default="detected", index=True
+    )  # detected, queued, processing, processed, removed
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # 同一文件夹只允许一个排队中或执行中的任务
+        Index(
+            "uq_jobs_active_folder",
+            "folder_id",
+            unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_jobs_claim", "status", "priority", "id"),
+    )
+    id = Column(Integer, primary_key=True)
+    folder_id = Column(Integer, ForeignKey("watch_folders.id"), nullable=True)
+    input_path = Column(String, nullable=False)
+    priority = Column(Integer, default=0)  # 数值越大越先执行
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    worker = Column(String)
+    enqueued_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    lease_until = Column(DateTime)
+    error_msg = Column(String)
 
 
 def get_or_create_watchfolder(db, path, status):
@@ -104,6 +155,36 @@ def get_or_create_anime(
     return anime
 
 
+def get_db():
+    """FastAPI 依赖：每个请求一个会话，结束后关闭"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def migrate(bind=engine):
+    """为已存在的数据库补上模型中新增的列和索引"""
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = column.type.compile(dialect=bind.dialect)
+                conn.execute(
+                    text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {ddl}')
+                )
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 def init_db():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     Base.metadata.create_all(engine)
+    migrate(engine)
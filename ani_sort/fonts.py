@@ -0,0 +1,206 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+OVERRIDE_BLOCK = re.compile(r"(\{[^}]*\})")
+OVERRIDE_TAG = re.compile(r"\\(fn[^\\}]*|r[^\\}]*|p\d+|b\d+|i\d+)")
+ESCAPES = re.compile(r"\\[Nnh]")
+
+UNION_STYLE_FORMAT = (
+    "Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, "
+    "BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, "
+    "Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, "
+    "Encoding"
+)
+UNION_EVENT_FORMAT = (
+    "Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
+)
+
+
+def _read_ass(path: Path) -> str:
+    raw = path.read_bytes()
+    if raw.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return raw.decode("utf-16")
+    return raw.decode("utf-8-sig", errors="ignore")
+
+
+def _family(name: str) -> str:
+    # "@" 前缀表示竖排，使用的是同一字体
+    return name.strip().lstrip("@")
+
+
+def _flag(value: str) -> bool:
+    """样式中的 Bold/Italic：-1 或 1 为真，也兼容字重数值"""
+    try:
+        v = int(value.strip())
+    except ValueError:
+        return False
+    return v != 0 and (v < 0 or v == 1 or v >= 600)
+
+
+def ass_font_usage(path: Path) -> dict[tuple, set]:
+    """解析 ASS 文件，返回 {(字体名, 粗体, 斜体): 用到的字符集合}"""
+    styles: dict = {}
+    usage: dict = {}
+    section = None
+    fields: list = []
+
+    for line in _read_ass(path).splitlines():
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]"):
+            section, fields = line.lower(), []
+            continue
+        key, _, value = line.partition(":")
+        key = key.strip().lower()
+
+        if key == "format":
+            fields = [f.strip().lower() for f in value.split(",")]
+        elif key == "style" and section in ("[v4+ styles]", "[v4 styles]") and fields:
+            values = dict(zip(fields, value.split(",", len(fields) - 1)))
+            styles[values.get("name", "").strip()] = (
+                _family(values.get("fontname", "")),
+                _flag(values.get("bold", "0")),
+                _flag(values.get("italic", "0")),
+            )
+        elif key == "dialogue" and section == "[events]" and fields:
+            values = dict(zip(fields, value.split(",", len(fields) - 1)))
+            line_style = values.get("style", "").strip().lstrip("*")
+            default = styles.get(line_style) or styles.get(
+                "Default", ("", False, False)
+            )
+            (font, bold, italic), drawing = default, False
+
+            for part in OVERRIDE_BLOCK.split(values.get("text", "")):
+                if part.startswith("{"):
+                    for tag in OVERRIDE_TAG.findall(part):
+                        if tag.startswith("fn"):
+                            font = _family(tag[2:]) or default[0]
+                        elif tag.startswith("r"):
+                            font, bold, italic = styles.get(tag[1:].strip(), default)
+                        elif tag.startswith("p"):
+                            drawing = int(tag[1:]) > 0
+                        elif tag.startswith("b"):
+                            bold = _flag(tag[1:])
+                        elif tag.startswith("i"):
+                            italic = _flag(tag[1:])
+                    continue
+                if drawing or not font:
+                    continue
+                if text := ESCAPES.sub("", part):
+                    usage.setdefault((font, bold, italic), set()).update(text)
+
+    return usage
+
+
+def font_signature(usage: dict[tuple, set]) -> str:
+    """按 (字体, 字形集合哈希) 计算字体需求的签名，字形集合相同则签名相同"""
+    h = hashlib.sha256()
+    for family, bold, italic in sorted(usage):
+        glyphs = "".join(sorted(usage[(family, bold, italic)]))
+        glyph_hash = hashlib.sha256(glyphs.encode("utf-8", "surrogatepass"))
+        h.update(
+            f"{family}\x00{bold:d}{italic:d}\x00{glyph_hash.hexdigest()}\n".encode()
+        )
+    return h.hexdigest()[:32]
+
+
+def write_union_ass(usage: dict[tuple, set], path: Path) -> Path:
+    """生成一个只包含各字体所需字形的 ASS 文件，交给 assfonts 子集化"""
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        "",
+        "[V4+ Styles]",
+        f"Format: {UNION_STYLE_FORMAT}",
+    ]
+    events = ["", "[Events]", f"Format: {UNION_EVENT_FORMAT}"]
+    for i, (family, bold, italic) in enumerate(sorted(usage)):
+        lines.append(
+            f"Style: F{i},{family},48,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,"
+            f"{-1 if bold else 0},{-1 if italic else 0},0,0,100,100,0,0,1,2,0,2,10,10,10,1"
+        )
+        glyphs = "".join(
+            sorted(c for c in usage[(family, bold, italic)] if c not in "{}\\\r\n")
+        )
+        events.append(f"Dialogue: 0,0:00:00.00,0:00:01.00,F{i},,0,0,0,,{glyphs}")
+    path.write_text("\n".join(lines + events) + "\n", encoding="utf-8")
+    return path
+
+
+class FontCache:
+    """子集化字体的磁盘缓存
+
+    每个条目是一个以字体签名命名的目录；使用时更新标记文件的 mtime，
+    总大小超过上限时按最近使用时间淘汰。
+    """
+
+    MARKER = ".complete"
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, signature: str) -> Path | None:
+        entry = self.cache_dir / signature
+        marker = entry / self.MARKER
+        if not marker.exists():
+            self.misses += 1
+            return None
+        os.utime(marker)
+        self.hits += 1
+        return entry
+
+    def staging_dir(self, signature: str) -> Path:
+        """返回用于生成新条目的临时目录，完成后调用 put 提交"""
+        path = self.cache_dir / f".tmp-{signature}-{uuid.uuid4().hex[:8]}"
+        path.mkdir(parents=True)
+        return path
+
+    def put(self, signature: str, staging: Path) -> Path:
+        entry = self.cache_dir / signature
+        (staging / self.MARKER).touch()
+        try:
+            staging.rename(entry)
+        except OSError:
+            # 其他线程/进程已写入相同条目
+            shutil.rmtree(staging, ignore_errors=True)
+        return entry
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            marker = entry / self.MARKER
+            if entry.name.startswith(".") or not marker.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+            entries.append((marker.stat().st_mtime, size, entry))
+        return entries
+
+    def evict(self, keep=()) -> None:
+        """按最近使用时间淘汰条目，直到总大小不超过上限（keep 中为本次使用的条目，不淘汰）"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry in keep:
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+    def purge_staging(self, max_age: float = 3600) -> None:
+        """清理异常中断留下的临时目录"""
+        now = time.time()
+        for entry in self.cache_dir.glob(".tmp-*"):
+            if now - entry.stat().st_mtime > max_age:
+                shutil.rmtree(entry, ignore_errors=True)
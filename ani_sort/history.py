@@ -0,0 +1,207 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+HISTORY_DIR = Path(os.path.dirname(__file__)) / "../tasks"
+HISTORY_FILE = "history.jsonl"
+LEGACY_FILE = "history.json"
+
+
+class TaskHistory:
+    """追加写入的任务历史（JSON Lines）
+
+    每个任务只追加一行，文件锁保证多进程并发追加互不覆盖；
+    当前文件超过 max_bytes 时压缩归档为 history-<时间>.jsonl.gz，只保留最近 keep 个。
+    查询使用内存中的行偏移索引，只需读取新追加的部分。
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = HISTORY_DIR,
+        max_bytes: int = 16 * 1024 * 1024,
+        keep: int = 10,
+    ) -> None:
+        self.dir = Path(directory)
+        self.path = self.dir / HISTORY_FILE
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self._lock = threading.Lock()
+        # 索引：[(偏移, task_id, status, anime)]，按写入顺序
+        self._index: list = []
+        self._indexed_size = 0
+        self._indexed_ino = None
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._migrate_legacy()
+
+    def _locked(self, f) -> None:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+    def _migrate_legacy(self) -> None:
+        """把旧版 history.json 转换为 JSONL，原文件改名保留"""
+        legacy = self.dir / LEGACY_FILE
+        if not legacy.exists() or self.path.exists():
+            return
+        try:
+            entries = json.loads(legacy.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        legacy.rename(legacy.with_name(LEGACY_FILE + ".migrated"))
+
+    def _is_current(self, f) -> bool:
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def append(self, entry: dict) -> None:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            while True:
+                with open(self.path, "ab") as f:
+                    self._locked(f)
+                    # 等待锁期间文件可能已被其他进程轮转，重新打开
+                    if not self._is_current(f):
+                        continue
+                    size = os.fstat(f.fileno()).st_size
+                    if size and size + len(line) > self.max_bytes:
+                        self._rotate()
+                        continue
+                    f.write(line)
+                    return
+
+    def _rotate(self) -> None:
+        """压缩归档当前文件（调用方持有文件锁）"""
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        rotated = self.dir / f"history-{stamp}.jsonl"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+
+        for old in self.archives()[self.keep :]:
+            old.unlink(missing_ok=True)
+
+    def archives(self) -> list[Path]:
+        """归档文件，新的在前"""
+        return sorted(self.dir.glob("history-*.jsonl.gz"), reverse=True)
+
+    def _refresh_index(self) -> None:
+        """只读取上次索引之后新追加的行；文件被轮转时重建索引"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            self._index, self._indexed_size, self._indexed_ino = [], 0, None
+            return
+        if st.st_ino != self._indexed_ino or st.st_size < self._indexed_size:
+            self._index, self._indexed_size, self._indexed_ino = [], 0, st.st_ino
+        if st.st_size == self._indexed_size:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_size)
+            offset = self._indexed_size
+            for raw in f:
+                if not raw.endswith(b"\n"):  # 正在写入的行
+                    break
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    entry = None
+                if isinstance(entry, dict):
+                    self._index.append(
+                        (
+                            offset,
+                            entry.get("task_id"),
+                            entry.get("status"),
+                            entry.get("anime"),
+                        )
+                    )
+                offset += len(raw)
+            self._indexed_size = offset
+
+    def _read_at(self, offsets: list[int]) -> list[dict]:
+        entries = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                entries.append(json.loads(f.readline()))
+        return entries
+
+    def query(
+        self,
+        status: str | None = None,
+        anime: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> list[dict]:
+        """按时间倒序查询当前文件中的任务记录"""
+        with self._lock:
+            self._refresh_index()
+            return self._read_at(self._matched(status, anime)[offset : offset + limit])
+
+    def count(self, status: str | None = None, anime: str | None = None) -> int:
+        """当前文件中符合条件的记录数，条件与 query 相同"""
+        with self._lock:
+            self._refresh_index()
+            if status is None and anime is None:
+                return len(self._index)
+            return len(self._matched(status, anime))
+
+    def _matched(self, status: str | None, anime: str | None) -> list[int]:
+        return [
+            pos
+            for pos, _, s, a in reversed(self._index)
+            if (status is None or s == status) and (anime is None or a == anime)
+        ]
+
+    def get(self, task_id: str) -> dict | None:
+        """按任务 ID 查找，当前文件中没有时再查找归档"""
+        with self._lock:
+            self._refresh_index()
+            for pos, tid, _, _ in reversed(self._index):
+                if tid == task_id:
+                    return self._read_at([pos])[0]
+
+        for archive in self.archives():
+            with gzip.open(archive, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if f'"{task_id}"' in line:
+                        entry = json.loads(line)
+                        if entry.get("task_id") == task_id:
+                            return entry
+        return None
+
+
+_history: TaskHistory | None = None
+_history_lock = threading.Lock()
+
+
+def get_history(config=None) -> TaskHistory:
+    """获取进程内共享的任务历史"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            if config is not None:
+                _history = TaskHistory(
+                    max_bytes=config.history.max_size_mb * 1024 * 1024,
+                    keep=config.history.keep,
+                )
+            else:
+                _history = TaskHistory()
+    return _history
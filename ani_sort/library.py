@@ -0,0 +1,171 @@
+"""从已整理的番剧中解析新文件夹
+
+Anime 表记录了每部整理过的番剧的 TMDB ID、名称与海报。新季度或其他字幕组的发布
+与已有条目的原始文件夹名或番剧名高度相似，用字符三元组（trigram）的 Dice 系数
+模糊匹配，超过阈值且词语完全相同时直接复用已有的 TMDB 信息，不再搜索 TMDB / 调用 AI。
+续作、总集篇、外传（"Overlord IV"、"Tokyo Ghoul:re"）只多出一个词，相似度同样很高，
+因此只容许大小写、标点与分隔符的差异。
+"""
+
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from sqlalchemy.exc import SQLAlchemyError
+from ani_sort.cache import normalize_stem
+from ani_sort import metrics
+
+TITLE_RE = re.compile(r"(?i)(.+?)(?:[_\s-]*(?:s|season)\s*(\d+))?$")
+BRACKETS_RE = re.compile(r"\s*(\[|\().*?(\]|\))\s*")
+NAME_RE = re.compile(r"^(.*) \(([^()]*)\)$")  # Anime.name 为 "名称 (年份)"
+WORD_RE = re.compile(r"\w+")
+
+
+def split_title(stem: str) -> tuple[str, int | None]:
+    """去掉方括号/圆括号标签与季数后缀，返回 (标题, 季数)"""
+    cleaned = BRACKETS_RE.sub("", stem)
+    if not (match := TITLE_RE.match(cleaned)):
+        return stem, None
+    return match[1], int(match[2]) if match[2] else None
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {normalize_stem(text)} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def words(text: str) -> frozenset[str]:
+    return frozenset(WORD_RE.findall(normalize_stem(text)))
+
+
+class LibraryIndex:
+    """Anime 表的 trigram 倒排索引，表内容变化后下次查询时重建"""
+
+    def __init__(self, threshold: float = 0.8) -> None:
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: list[dict] = []
+        self._sizes: list[int] = []
+        self._words: list[frozenset] = []
+        self._postings: dict[str, list[int]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _rows(self):
+        from sqlalchemy import func
+        from ani_sort.db import SessionLocal, Anime
+
+        session = SessionLocal()
+        try:
+            version = session.query(
+                func.count(Anime.id), func.max(Anime.id), func.max(Anime.last_updated)
+            ).one()
+            if tuple(version) == self._version:
+                return None, None
+            rows = (
+                session.query(
+                    Anime.name,
+                    Anime.orig_path,
+                    Anime.tmdb_id,
+                    Anime.media_type,
+                    Anime.poster_path,
+                )
+                # 迁移前的记录没有 media_type，无法区分 TV 与电影，不参与匹配
+                .filter(Anime.tmdb_id.isnot(None), Anime.media_type.isnot(None))
+                .order_by(Anime.id)
+                .all()
+            )
+            return tuple(version), rows
+        finally:
+            session.close()
+
+    def refresh(self) -> None:
+        version, rows = self._rows()
+        if rows is None:
+            return
+
+        entries, sizes, word_sets, postings = [], [], [], {}
+        for name, orig_path, tmdb_id, media_type, poster_path in rows:
+            title, year = name, None
+            if m := NAME_RE.match(name or ""):
+                title, year = m[1], m[2]
+            identity = {
+                "id": tmdb_id,
+                "name": title,
+                "original_name": title,
+                "first_air_date": year if year and year.isdigit() else None,
+                "poster_path": poster_path,
+                "backdrop_path": None,
+                "media_type": media_type,
+                "source": "library",
+            }
+            # 已解析的番剧名与原始输入文件夹名都作为匹配对象
+            keys = {title}
+            if orig_path:
+                keys.add(split_title(Path(orig_path).name)[0])
+            for key in keys:
+                grams = trigrams(key)
+                for g in grams:
+                    postings.setdefault(g, []).append(len(entries))
+                entries.append({**identity, "key": key})
+                sizes.append(len(grams))
+                word_sets.append(words(key))
+
+        self._entries, self._sizes, self._postings = entries, sizes, postings
+        self._words = word_sets
+        self._version = version
+
+    def lookup(self, title: str) -> tuple[dict, float, str] | None:
+        """返回词语相同、相似度最高且不低于阈值的条目、相似度与匹配到的名称；
+        同分时取较新的条目
+        """
+        with self._lock:
+            try:
+                self.refresh()
+            except SQLAlchemyError:
+                pass  # 数据库尚未初始化或暂时不可用时沿用已有的索引
+            query, query_words = trigrams(title), words(title)
+            shared = Counter(i for g in query for i in self._postings.get(g, ()))
+            best, best_score = None, 0.0
+            for i, common in shared.items():
+                score = 2 * common / (len(query) + self._sizes[i])
+                if self._words[i] != query_words:
+                    continue
+                if score > best_score or (
+                    score == best_score and best is not None and i > best
+                ):
+                    best, best_score = i, score
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                metrics.CACHE_LOOKUPS.inc(cache="library", result="miss")
+                return None
+            self.hits += 1
+            metrics.CACHE_LOOKUPS.inc(cache="library", result="hit")
+            entry = {k: v for k, v in self._entries[best].items() if k != "key"}
+            return entry, best_score, self._entries[best]["key"]
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "entries": len(self._entries),
+        }
+
+
+_library: LibraryIndex | None = None
+_library_lock = threading.Lock()
+
+
+def get_library_index(config=None) -> LibraryIndex | None:
+    """获取进程内共享的番剧库索引，配置中关闭时返回 None"""
+    global _library
+    if config is not None and not config.library.enabled:
+        return None
+    with _library_lock:
+        if _library is None:
+            _library = LibraryIndex(config.library.threshold if config else 0.8)
+    return _library
@@ -0,0 +1,247 @@
+"""硬链接引擎
+
+按目标目录分组，用目录文件描述符（dir_fd）执行 link，避免每个文件重复解析完整路径；
+目标在网络文件系统上时按目录分块并发执行，掩盖单次元数据操作的往返延迟。
+源与目标不在同一设备（EXDEV）时改用 reflink，不支持时用 copy_file_range 复制。
+没有 dir_fd 的平台（Windows）按完整路径链接，跨设备时用 shutil 复制。
+"""
+
+import errno
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from ani_sort.utils import NETWORK_FS, filesystem_type
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FICLONE = 0x40049409  # linux/fs.h
+CHUNK_SIZE = 256  # 每个并发单元处理的文件数
+NETWORK_WORKERS = 8  # workers 为 0 时网络文件系统上的默认并发数
+COPY_BUFSIZE = 1024 * 1024  # 用户态复制的块大小
+
+# 不支持目录文件描述符的平台（Windows）按完整路径链接与复制
+DIR_FD = (
+    hasattr(os, "O_DIRECTORY")
+    and os.link in os.supports_dir_fd
+    and os.open in os.supports_dir_fd
+)
+
+# 单个文件的处理结果
+LINKED = "linked"
+EXISTS = "exists"
+REFLINKED = "reflinked"
+COPIED = "copied"
+FAILED = "failed"
+
+# reflink / copy_file_range 不可用时的错误码
+_UNSUPPORTED = {
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSOCK,  # macOS 的 sendfile 只能写入套接字
+}
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> None:
+    """copy_file_range 复制（内核内完成，NFS 4.2 上可由服务端复制），
+    不支持时依次改用 sendfile、用户态读写
+    """
+    modes = ["read"]
+    if hasattr(os, "sendfile"):
+        modes.insert(0, "sendfile")
+    if hasattr(os, "copy_file_range"):
+        modes.insert(0, "copy_file_range")
+    offset = 0
+    while offset < size:
+        mode = modes[0]
+        try:
+            if mode == "copy_file_range":
+                n = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+            elif mode == "sendfile":
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                n = os.sendfile(dst_fd, src_fd, offset, size - offset)
+            else:
+                n = _copy_read(src_fd, dst_fd, offset, min(COPY_BUFSIZE, size - offset))
+        except OSError as e:
+            if len(modes) == 1 or e.errno not in _UNSUPPORTED:
+                raise
+            modes.pop(0)
+            continue
+        if n == 0:
+            break
+        offset += n
+
+
+def _copy_read(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    view = memoryview(os.read(src_fd, length))
+    n = len(view)
+    while view:
+        view = view[os.write(dst_fd, view) :]
+    return n
+
+
+def _clone(src_fd: int, dst_fd: int, size: int) -> str:
+    """先尝试 reflink（共享数据块，不占额外空间），失败时复制，返回使用的方式"""
+    if fcntl is not None:
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            return REFLINKED
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    _copy_range(src_fd, dst_fd, size)
+    return COPIED
+
+
+class LinkEngine(object):
+    """批量创建硬链接
+    workers: 并发处理的目录分块数，0 表示按目标文件系统自动选择
+    cross_device: 跨设备时的处理方式，copy（reflink 或复制）/ fail
+    """
+
+    def __init__(self, workers: int = 1, cross_device: str = "copy") -> None:
+        self.workers = max(1, workers)
+        self.cross_device = cross_device
+
+    @classmethod
+    def for_path(cls, dest_root, config=None) -> "LinkEngine":
+        workers = config.workers if config else 0
+        if workers <= 0:
+            fstype = filesystem_type(Path(dest_root).resolve())
+            workers = NETWORK_WORKERS if fstype in NETWORK_FS else 1
+        return cls(workers, config.cross_device if config else "copy")
+
+    def run(self, ops: list[tuple[str, str]]) -> dict[str, tuple[str, OSError | None]]:
+        """ops: [(源文件, 目标文件)]，返回 {源文件: (结果, 错误)}"""
+        groups: dict = {}
+        for src, dest in ops:
+            dest_dir, name = os.path.split(dest)
+            groups.setdefault(dest_dir, []).append((src, name))
+        chunks = [
+            (dest_dir, items[i : i + CHUNK_SIZE])
+            for dest_dir, items in groups.items()
+            for i in range(0, len(items), CHUNK_SIZE)
+        ]
+
+        results: dict = {}
+        if self.workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                results.update(self._run_chunk(*chunk))
+        else:
+            with ThreadPoolExecutor(min(self.workers, len(chunks))) as pool:
+                for r in pool.map(lambda chunk: self._run_chunk(*chunk), chunks):
+                    results.update(r)
+        return results
+
+    def _run_chunk(self, dest_dir: str, items: list) -> dict:
+        if not DIR_FD:
+            return self._run_chunk_paths(dest_dir, items)
+        try:
+            os.makedirs(dest_dir, exist_ok=True)
+            dir_fd = os.open(dest_dir, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            return {src: (FAILED, e) for src, _ in items}
+
+        results: dict = {}
+        src_fds: dict = {}
+        try:
+            for src, name in items:
+                src_dir, src_name = os.path.split(src)
+                try:
+                    if src_dir not in src_fds:
+                        src_fds[src_dir] = os.open(
+                            src_dir, os.O_RDONLY | os.O_DIRECTORY
+                        )
+                    method = self._link(src_fds[src_dir], src_name, dir_fd, name)
+                    results[src] = (method, None)
+                except OSError as e:
+                    results[src] = (FAILED, e)
+        finally:
+            for fd in src_fds.values():
+                os.close(fd)
+            os.close(dir_fd)
+        return results
+
+    def _run_chunk_paths(self, dest_dir: str, items: list) -> dict:
+        try:
+            os.makedirs(dest_dir, exist_ok=True)
+        except OSError as e:
+            return {src: (FAILED, e) for src, _ in items}
+
+        results: dict = {}
+        for src, name in items:
+            try:
+                results[src] = (
+                    self._link_path(src, os.path.join(dest_dir, name)),
+                    None,
+                )
+            except OSError as e:
+                results[src] = (FAILED, e)
+        return results
+
+    def _link_path(self, src: str, dest: str) -> str:
+        try:
+            os.link(src, dest)
+            return LINKED
+        except FileExistsError:
+            return EXISTS
+        except OSError as e:
+            if e.errno != errno.EXDEV or self.cross_device != "copy":
+                raise
+        try:
+            dst = open(dest, "xb")
+        except FileExistsError:
+            return EXISTS
+        try:
+            with dst, open(src, "rb") as f:
+                shutil.copyfileobj(f, dst, COPY_BUFSIZE)
+            shutil.copystat(src, dest)
+        except BaseException:
+            os.unlink(dest)  # 不留下不完整的文件
+            raise
+        return COPIED
+
+    def _link(self, src_dir_fd: int, src_name: str, dir_fd: int, name: str) -> str:
+        # 直接链接，目标已存在时由 FileExistsError 判断，省去一次 stat
+        try:
+            os.link(src_name, name, src_dir_fd=src_dir_fd, dst_dir_fd=dir_fd)
+            return LINKED
+        except FileExistsError:
+            return EXISTS
+        except OSError as e:
+            if e.errno != errno.EXDEV or self.cross_device != "copy":
+                raise
+        return self._copy(src_dir_fd, src_name, dir_fd, name)
+
+    def _copy(self, src_dir_fd: int, src_name: str, dir_fd: int, name: str) -> str:
+        src = os.open(src_name, os.O_RDONLY, dir_fd=src_dir_fd)
+        try:
+            st = os.fstat(src)
+            try:
+                dst = os.open(
+                    name,
+                    os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                    st.st_mode & 0o777,
+                    dir_fd=dir_fd,
+                )
+            except FileExistsError:
+                return EXISTS
+            try:
+                method = _clone(src, dst, st.st_size)
+                os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+            except BaseException:
+                os.close(dst)
+                os.unlink(name, dir_fd=dir_fd)  # 不留下不完整的文件
+                raise
+            os.close(dst)
+            return method
+        finally:
+            os.close(src)
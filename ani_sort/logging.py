@@ -32,3 +32,30 @@ def setup_logger(verbose=False):
     logger.propagate = False
 
     return logger
+
+
+class BufferedLogger:
+    """暂存单个文件（夹）的日志，处理完成后再按顺序写入真正的 logger，避免并行时日志交错"""
+
+    def __init__(self) -> None:
+        self.records: list = []
+
+    def log(self, level: int, msg: str) -> None:
+        self.records.append((level, msg))
+
+    def debug(self, msg: str) -> None:
+        self.log(logging.DEBUG, msg)
+
+    def info(self, msg: str) -> None:
+        self.log(logging.INFO, msg)
+
+    def warning(self, msg: str) -> None:
+        self.log(logging.WARNING, msg)
+
+    def error(self, msg: str) -> None:
+        self.log(logging.ERROR, msg)
+
+    def flush(self, logger: logging.Logger) -> None:
+        for level, msg in self.records:
+            logger.log(level, msg)
+        self.records.clear()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = ".anisort_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def fingerprint(path: str | Path) -> list:
+    """源文件指纹：(设备号, inode, 大小, 修改时间)"""
+    st = os.stat(path)
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def target_fingerprint(path: str | Path) -> list | None:
+    """目标文件的 (inode, 大小)，不存在时为 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_size]
+
+
+def rules_digest(config) -> str:
+    """规则与影响目标路径的配置的摘要，变化后旧清单作废"""
+    raw = json.dumps(
+        [
+            [dict(r.raw) for r in config.ruleset.rules],
+            config.ignore_exts,
+            config.general.chinese_traditional,
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class SeriesManifest:
+    """保存在整理结果目录中的文件清单：源文件指纹 -> 目标路径
+
+    再次整理同一部番时，指纹未变的文件直接跳过解析与链接。
+    """
+
+    def __init__(self, parent_dir: str | Path, digest: str) -> None:
+        self.path = Path(parent_dir) / MANIFEST_NAME
+        self.digest = digest
+        self.entries: dict = {}
+        self.dirty = False
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if (
+            data.get("version") == MANIFEST_VERSION
+            and data.get("digest") == self.digest
+        ):
+            self.entries = data.get("entries", {})
+
+    def lookup(self, src: str, fp: list) -> str | None:
+        """源文件指纹一致且目标文件仍是上次链接的文件时返回上次的目标路径
+        目标被删除或替换时移除该条记录，由调用方重新链接
+        """
+        entry = self.entries.get(src)
+        if not entry or entry["fp"] != fp:
+            return None
+        dest = entry["dest"]
+        if dest != "ignore":
+            target = entry.get("target")
+            if target is None or target_fingerprint(dest) != target:
+                del self.entries[src]
+                self.dirty = True
+                return None
+        return dest
+
+    def record(self, src: str, fp: list, dest: str) -> None:
+        entry = {"fp": fp, "dest": dest}
+        if dest != "ignore":
+            entry["target"] = target_fingerprint(dest)
+        self.entries[src] = entry
+        self.dirty = True
+
+    def disappeared(self, root: str | Path, seen) -> list[str]:
+        """返回 root 下清单中有、本次扫描却不存在的源文件，并从清单中移除"""
+        prefix = str(root).rstrip("/") + "/"
+        gone = [
+            src
+            for src in self.entries
+            if (src == str(root) or src.startswith(prefix)) and src not in seen
+        ]
+        for src in gone:
+            del self.entries[src]
+            self.dirty = True
+        return gone
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION,
+                    "digest": self.digest,
+                    "entries": self.entries,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -1,5 +1,25 @@
 import re
-from ani_sort.api import call_tmdb, call_ai
+import json
+from ani_sort.api import call_tmdb, call_ai, get_http_client
+from ani_sort.cache import get_tmdb_cache, get_ai_memo, normalize_stem
+from ani_sort import metrics
+from ani_sort.tmdb_index import get_title_index
+from ani_sort.library import get_library_index, split_title
+
+# 本地索引结果需要从详情接口补充的字段
+DETAIL_KEYS = (
+    "name",
+    "title",
+    "first_air_date",
+    "release_date",
+    "poster_path",
+    "backdrop_path",
+)
+
+BATCH_INSTRUCTION = """
+下面每一行是一个独立的番剧文件夹名称（以序号开头），请分别按上述要求处理。
+只返回一个 JSON 对象，键为序号字符串，值为对应的结果字符串，不要输出其他内容。
+"""
 
 
 def extract_groups(stem: str) -> dict:
@@ -22,52 +42,202 @@ def extract_groups(stem: str) -> dict:
     return {"group": group, "others": others}
 
 
-def get_ani_info(name: str, config=None, logger=None) -> dict:
-    """获取番剧的信息
+def ask_ai(name: str, prompt: str, config=None, logger=None, context: str = "") -> str:
+    """调用 AI 并按 提示词 + 上下文 + 规范化文件夹名 记忆结果
     name: 番剧文件名
     """
-    query: str = (
-        logger.info("调用 AI - 1")
-        or call_ai(config.ai.api, f"{name}\n\n{config.ai.prompt1}")
-        if config.ai.call
-        else (
-            match := re.match(
-                r"(?i)(.+?)(?:[_\s-]*(?:s|season)\s*(\d+))?$",
-                re.sub(r"\s*(\[|\().*?(\]|\))\s*", "", name),
+    memo = get_ai_memo(config)
+    if memo is not None and (answer := memo.get(prompt, name, context)) is not None:
+        metrics.CACHE_LOOKUPS.inc(cache="ai", result="hit")
+        if logger:
+            logger.debug(f"AI memo hit for {name}")
+        return answer
+    if memo is not None:
+        metrics.CACHE_LOOKUPS.inc(cache="ai", result="miss")
+
+    content = "\n\n".join(part for part in (name, context, prompt) if part)
+    with metrics.stage("ai"):
+        answer = call_ai(
+            config.ai.api, content, client=get_http_client("ai", config)
+        ).strip()
+    if memo is not None:
+        memo.set(prompt, name, answer, context)
+    return answer
+
+
+def _parse_batch_answer(text: str) -> dict:
+    """解析批量请求返回的 JSON（兼容 ```json 代码块）"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    return {str(k): str(v).strip() for k, v in json.loads(text).items()}
+
+
+def ask_ai_batch(
+    names: list[str], prompt: str, config=None, logger=None
+) -> dict[str, str]:
+    """在一次请求中批量解析多个文件夹名，结果写入与 ask_ai 相同的记忆表
+    names: 番剧文件名列表
+    """
+    memo = get_ai_memo(config)
+    results: dict = {}
+    pending: dict = {}  # 规范化名称 -> 原始名称，合并近似重复的文件夹
+    for name in names:
+        if memo is not None and (answer := memo.get(prompt, name)) is not None:
+            results[name] = answer
+        else:
+            pending.setdefault(normalize_stem(name), name)
+
+    todo = list(pending.values())
+    size = max(1, config.ai.batch_size)
+    for start in range(0, len(todo), size):
+        chunk = todo[start : start + size]
+        if logger:
+            logger.info(f"调用 AI - 批量解析 {len(chunk)} 个文件夹")
+        content = f"{prompt}\n{BATCH_INSTRUCTION}\n" + "\n".join(
+            f"{i}. {name}" for i, name in enumerate(chunk, 1)
+        )
+        try:
+            answers = _parse_batch_answer(
+                call_ai(config.ai.api, content, client=get_http_client("ai", config))
             )
-        )[1]
-    )
-    res = logger.info("调用 TMDB") or call_tmdb(
-        config.tmdb.api,
-        # url="https://api.themoviedb.org/3/search/tv",
-        url="https://api.themoviedb.org/3/search/multi",
-        params={"query": query},
-        proxies=config.general.proxies,
-        logger=logger,
-    )
+        except Exception as e:
+            if logger:
+                logger.warning(f"AI 批量解析失败，将逐个解析：{e}")
+            continue
+
+        for i, name in enumerate(chunk, 1):
+            if answer := answers.get(str(i)):
+                results[name] = answer
+                if memo is not None:
+                    memo.set(prompt, name, answer)
+
+    # 近似重复的文件夹共用代表项的结果（记忆表键相同，无需重复写入）
+    for name in names:
+        if (
+            name not in results
+            and (rep := pending.get(normalize_stem(name))) in results
+        ):
+            results[name] = results[rep]
+    return results
+
+
+def prefetch_ai_titles(names: list[str], config=None, logger=None) -> dict[str, str]:
+    """批量预解析待处理文件夹的番剧名称，之后的 get_ani_info 直接命中记忆表"""
+    if not config.ai.call or not names:
+        return {}
+    return ask_ai_batch(names, config.ai.prompt1, config, logger)
+
+
+def search_title(query: str, config=None, logger=None) -> dict:
+    """搜索番剧：tmdb.resolver 为 local 时先查本地标题索引，未命中再请求 /search/multi"""
+    if (index := get_title_index(config)) is not None:
+        results = index.search(query)
+        metrics.CACHE_LOOKUPS.inc(
+            cache="title_index", result="hit" if results else "miss"
+        )
+        if results:
+            logger.info(f"本地标题索引命中：{query}")
+            return {"results": results}
+
+    with metrics.stage("tmdb"):
+        return logger.info("调用 TMDB") or call_tmdb(
+            config.tmdb.api,
+            # url="https://api.themoviedb.org/3/search/tv",
+            url="https://api.themoviedb.org/3/search/multi",
+            params={"query": query},
+            proxies=config.general.proxies,
+            logger=logger,
+            cache=get_tmdb_cache(config),
+            client=get_http_client("tmdb", config),
+        )
+
+
+def fetch_details(
+    info: dict, season: int | None = None, config=None, logger=None
+) -> dict:
+    """/{type}/{id} 详情；TV 给定 season 时用 append_to_response 在同一请求中附带该季海报
+    （结果中的 "season/{n}/images"）
+    """
+    media_type = info.get("media_type") or "tv"
+    params = {"append_to_response": f"season/{season}/images"} if season else {}
+    if media_type != "tv":
+        params = {}
+    with metrics.stage("tmdb"):
+        return call_tmdb(
+            config.tmdb.api,
+            url=f'https://api.themoviedb.org/3/{media_type}/{info["id"]}',
+            params=params,
+            proxies=config.general.proxies,
+            logger=logger,
+            cache=get_tmdb_cache(config),
+            client=get_http_client("tmdb", config),
+        )
+
+
+def fill_details(
+    info: dict, season: int | None = None, config=None, logger=None
+) -> tuple[dict, dict | None]:
+    """本地索引的结果只有 ID 与原始标题，从详情接口补充中文名、日期与海报
+    返回 (补充后的结果, 详情)；网络不可用时保留原始标题，日期与海报留空，详情为 None
+    """
     try:
-        info: dict = res.json()["results"][0]
-        if config.tmdb.manual and res.json()["results"]:
-            logger.info(
-                "\n"
-                + "\n".join(
-                    f'{i}、{j["name"]} ({j["first_air_date"] if j["first_air_date"] else "None"})'
-                    for i, j in enumerate(res.json()["results"])
+        details = fetch_details(info, season, config, logger)
+    except Exception as e:
+        logger.warning(f"获取 TMDB 详情失败，使用本地索引中的原始标题：{e}")
+        return info, None
+    return {**info, **{k: details[k] for k in DETAIL_KEYS if details.get(k)}}, details
+
+
+def get_ani_info(name: str, config=None, logger=None) -> dict:
+    """获取番剧的信息
+    name: 番剧文件名
+    """
+    title, parsed_season = split_title(name)
+    # 手动选择结果时不走番剧库，保证每次都能看到候选列表
+    library = None if config.tmdb.manual else get_library_index(config)
+    hit = library.lookup(title) if library else None
+    if hit:
+        info, score, key = hit
+        logger.info(
+            f"命中番剧库：{title} -> {key}，使用 {info['name']} "
+            f"(TMDB {info['media_type']}/{info['id']}, 相似度 {score:.2f})"
+        )
+    else:
+        query: str = (
+            logger.info("调用 AI - 1")
+            or ask_ai(name, config.ai.prompt1, config, logger)
+            if config.ai.call
+            else title
+        )
+        res = search_title(query, config, logger)
+        try:
+            info: dict = res["results"][0]
+            if config.tmdb.manual and res["results"]:
+                logger.info(
+                    "\n"
+                    + "\n".join(
+                        f'{i}、{j["name"]} ({j["first_air_date"] if j["first_air_date"] else "None"})'
+                        for i, j in enumerate(res["results"])
+                    )
+                    + "\n"
                 )
-                + "\n"
-            )
 
-            if (_input := input("请输入你想选择的结果的序号：")).isdigit():
-                info: dict = res.json()["results"][int(_input)]
-    except Exception as e:
-        raise Exception(f"无法搜索到该动漫，请更改文件夹名称后再试一次 {e}")
+                if (_input := input("请输入你想选择的结果的序号：")).isdigit():
+                    info: dict = res["results"][int(_input)]
+        except Exception as e:
+            raise Exception(f"无法搜索到该动漫，请更改文件夹名称后再试一次 {e}")
+
+    # 详情请求（补充本地索引结果、AI 判断季数、TV 的季海报）顺带取得文件夹名中
+    # 季数的海报，季数一致时不再单独请求季海报
+    details = None
+    if info.get("source") == "local":
+        info, details = fill_details(info, parsed_season or 1, config, logger)
+    elif config.ai.call or (info.get("media_type") or "tv") == "tv":
+        details = fetch_details(info, parsed_season or 1, config, logger)
 
     if config.ai.call:
-        seasons_info: list = call_tmdb(
-            config.tmdb.api,
-            url=f'https://api.themoviedb.org/3/tv/{info["id"]}',
-            proxies=config.general.proxies,
-        ).json()["seasons"]
+        seasons_info: list = details["seasons"]
         seasons_conten: list = "\n".join(
             [
                 f'{j["name"]}: {i + 1}'
@@ -79,12 +249,12 @@ def get_ani_info(name: str, config=None, logger=None) -> dict:
             ]
         )
         season: int = logger.info("调用 AI - 2") or int(
-            call_ai(config.ai.api, f"{name}\n\n{seasons_conten}\n\n{config.ai.prompt2}")
+            ask_ai(name, config.ai.prompt2, config, logger, context=seasons_conten)
         )
     else:
-        season: int = int(match[2]) if match[2] else 1
+        season: int = parsed_season or 1
 
-    return {
+    result = {
         "name": info.get("name") or info.get("title"),
         # "date": info["first_air_date"].split("-")[0] or "年份未知",
         "date": (info.get("first_air_date") or info.get("release_date") or "年份未知").split("-")[0],
@@ -95,22 +265,45 @@ def get_ani_info(name: str, config=None, logger=None) -> dict:
         "backdrop_path": info["backdrop_path"],
         "media_type": info.get("media_type"),
     }
+    if details and (images := details.get(f"season/{season}/images")) is not None:
+        posters = images.get("posters")
+        result["season_poster_path"] = posters[0]["file_path"] if posters else None
+    return result
 
 
 def get_season_poster(series_id, season, config=None, logger=None):
     url = f"https://api.themoviedb.org/3/tv/{series_id}/season/{season}/images"
 
-    res = logger.info("调用 TMDB") or call_tmdb(
-        config.tmdb.api,
-        url=url,
-        params={},
-        proxies=config.general.proxies,
-        logger=logger,
-    )
+    try:
+        with metrics.stage("tmdb"):
+            data = logger.info("调用 TMDB") or call_tmdb(
+                config.tmdb.api,
+                url=url,
+                params={},
+                proxies=config.general.proxies,
+                logger=logger,
+                cache=get_tmdb_cache(config),
+                client=get_http_client("tmdb", config),
+            )
+    except Exception as e:
+        # 本地解析模式下海报不是必需的，离线时继续整理
+        if config.tmdb.resolver != "local":
+            raise
+        logger.warning(f"获取季海报失败：{e}")
+        return None
 
-    data = res.json()
     poster_path = None
     if data.get("posters"):
         poster_path = data["posters"][0]["file_path"]
 
     return poster_path
+
+
+def resolve_metadata(name: str, config=None, logger=None) -> dict:
+    """get_ani_info 的结果，TV 另外包含 season_poster_path"""
+    info = get_ani_info(name, config, logger)
+    if info["media_type"] == "tv" and "season_poster_path" not in info:
+        info["season_poster_path"] = get_season_poster(
+            info["tmdb_id"], info["season"], config, logger
+        )
+    return info
@@ -0,0 +1,219 @@
+"""任务分阶段计时与 Prometheus 指标
+
+每个任务持有一个 StageTimer，run_sort_task 用 track() 把它绑定到当前线程，
+core / metadata 中的 stage() 据此把耗时累加到对应阶段（未绑定时不计时）。
+任务结束后各阶段耗时写入 Task.timings，并计入进程内的直方图，由 /metrics 输出。
+
+阶段：config、metadata（包含 tmdb 与 ai，三者有重叠）、scan、normalize、link、
+table、move、subset。
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{k}="{v}"' for k, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter(object):
+    def __init__(self, name: str, help: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_labels(self.labelnames, key)} {_format(value)}"
+                )
+        return lines
+
+
+class Histogram(object):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数..., 总和, 次数]
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        with self._lock:
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, data in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, data):
+                    labels = _labels(names, key + (_format(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _labels(names, key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format(data[-2])}")
+                lines.append(f"{self.name}_count{labels} {data[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "anisort_stage_seconds", "Time spent in each stage of a task", ("stage",)
+)
+TASK_SECONDS = Histogram(
+    "anisort_task_seconds", "Total duration of sort tasks", ("status",)
+)
+TASKS = Counter("anisort_tasks_total", "Finished sort tasks", ("status",))
+CACHE_LOOKUPS = Counter(
+    "anisort_cache_lookups_total",
+    "Metadata cache and local index lookups",
+    ("cache", "result"),
+)
+LINKS_CREATED = Counter(
+    "anisort_links_created_total", "Files linked, including cross-device copies"
+)
+CROSS_DEVICE = Counter(
+    "anisort_cross_device_total",
+    "Files reflinked or copied because source and destination are on different devices",
+    ("method",),
+)
+FILES_SKIPPED = Counter(
+    "anisort_files_skipped_total", "Files not linked by a task", ("reason",)
+)
+FAILURES = Counter("anisort_failures_total", "Failed operations", ("kind",))
+
+REGISTRY = [
+    STAGE_SECONDS,
+    TASK_SECONDS,
+    TASKS,
+    CACHE_LOOKUPS,
+    LINKS_CREATED,
+    CROSS_DEVICE,
+    FILES_SKIPPED,
+    FAILURES,
+]
+
+
+def render() -> str:
+    """Prometheus 文本格式"""
+    return "\n".join(line for m in REGISTRY for line in m.render()) + "\n"
+
+
+class StageTimer(object):
+    """累加单个任务各阶段的耗时（秒）"""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.stages: dict = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def as_dict(self) -> dict:
+        result = {k: round(v, 4) for k, v in self.stages.items()}
+        result["total"] = round(time.perf_counter() - self.start, 4)
+        return result
+
+    def observe(self, status: str) -> None:
+        """计入进程内的直方图与计数器"""
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+        TASK_SECONDS.observe(time.perf_counter() - self.start, status=status)
+        TASKS.inc(status=status)
+
+
+_local = threading.local()
+
+
+def current() -> StageTimer | None:
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def track(timer: StageTimer):
+    """在当前线程内把 stage() 的耗时记入 timer"""
+    previous = current()
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+@contextmanager
+def stage(name: str):
+    """当前线程绑定了 StageTimer 时记录该阶段耗时，否则不做任何事"""
+    timer = current()
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+def tracked(func):
+    """装饰器：为每次调用创建 StageTimer 并绑定到当前线程，函数内用 current() 取得"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track(StageTimer()):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def timed(name: str):
+    """装饰器：函数的执行时间记为 name 阶段"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
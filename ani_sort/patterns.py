@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+
+try:
+    from re import _parser as sre_parse
+    from re._constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT
+
+# 第 0 集判断
+ZERO_EPISODE = re.compile(r"(\d+)(?:[v|_]\d+){0,1}")
+
+# 预筛关键字的最短长度，过短的 ASCII 关键字几乎不过滤任何文件名
+MIN_KEYWORD_LEN = 2
+
+# 忽略大小写时会匹配 ASCII 字母的特殊字符；须在 lower() 之前替换，
+# "İ".lower() 是两个码位 "i̇"，不再包含关键字中的 "i"
+_CASEFOLD = str.maketrans({"\u017f": "s", "\u0130": "i", "\u0131": "i", "\u212a": "k"})
+
+
+def _required_literals(parsed) -> frozenset:
+    """从解析后的正则中找出必然出现的字面量（满足其一即可），找不到时返回空集"""
+    candidates = []
+    run: list = []
+
+    def flush():
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run.clear()
+
+    for op, av in parsed:
+        if op is LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is SUBPATTERN:
+            if sub := _required_literals(av[-1]):
+                candidates.append(sub)
+        elif op is BRANCH:
+            alts = [_required_literals(branch) for branch in av[1]]
+            if all(alts):
+                candidates.append(frozenset().union(*alts))
+        elif op in (MAX_REPEAT, MIN_REPEAT) and av[0] >= 1:
+            if sub := _required_literals(av[2]):
+                candidates.append(sub)
+    flush()
+
+    candidates = [c for c in candidates if all(map(_selective, c))]
+    if not candidates:
+        return frozenset()
+    # 选最短关键字最长、备选最少的一组
+    return max(candidates, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+def _selective(keyword: str) -> bool:
+    return len(keyword) >= MIN_KEYWORD_LEN or not keyword.isascii()
+
+
+def extract_keywords(pattern: str) -> frozenset:
+    """提取规则的预筛关键字（小写）；无法提取时返回空集，表示总是尝试该规则"""
+    try:
+        literals = _required_literals(sre_parse.parse(pattern))
+    except Exception:
+        return frozenset()
+    return frozenset(k.lower() for k in literals)
+
+
+@dataclass(frozen=True)
+class Rule:
+    type: str
+    regex: re.Pattern
+    normalize: str | None
+    priority: int
+    index: int
+    keywords: frozenset
+    raw: MappingProxyType
+
+
+class PatternEngine:
+    """编译后的文件名匹配规则集
+
+    规则只编译一次，并从每条正则中提取必然出现的字面量作为预筛关键字；
+    匹配时按顺序只尝试关键字命中（或没有关键字）的规则，结果与逐条顺序匹配一致。
+    order: "file" 按 pattern_rules.yaml 中的书写顺序，"priority" 按 priority 升序
+    """
+
+    def __init__(self, patterns: list[dict], order: str = "file") -> None:
+        rules = []
+        for i, p in enumerate(patterns):
+            source = getattr(p["regex"], "pattern", p["regex"])
+            rules.append(
+                Rule(
+                    type=p["type"],
+                    regex=re.compile(source),
+                    normalize=p.get("normalize"),
+                    priority=p.get("priority", 0),
+                    index=i,
+                    keywords=extract_keywords(source),
+                    raw=MappingProxyType(dict(p)),
+                )
+            )
+        if order == "priority":
+            rules.sort(key=lambda r: (r.priority, r.index))
+        self.rules: tuple[Rule, ...] = tuple(rules)
+        self.order = order
+
+    def candidates(self, name: str):
+        """按顺序产出可能匹配的规则：文件名不含任何必需关键字的规则直接跳过"""
+        text = name.translate(_CASEFOLD).lower()
+        for rule in self.rules:
+            if not rule.keywords or any(k in text for k in rule.keywords):
+                yield rule
+
+    def match(self, name: str) -> tuple[Rule, re.Match] | None:
+        for rule in self.candidates(name):
+            if m := rule.regex.search(name):
+                return rule, m
+        return None
+
+    def parse(self, name: str, default_season: int) -> dict | None:
+        """解析番剧文件名
+        name: 番剧文件名
+        default_season: 文件名中没有季数时使用的季数
+        """
+        if (result := self.match(name)) is None:
+            return None
+        rule, match = result
+
+        if rule.type == "SE_EP":
+            season, match_2 = int(match[1]), match[2]
+        else:
+            match_2: str = match[1] if rule.type == "EP" else match[2] or "1"
+            season: int = default_season
+
+        # 处理第0集的情况
+        if (match2 := ZERO_EPISODE.match(match_2)) and int(match2[1]) == 0:
+            return None
+
+        return {
+            **rule.raw,
+            "regex": rule.regex,
+            "season": f"{season:02d}",
+            "episode": (
+                f"{int(match_2):02d}" if match_2.isdigit() else match_2.split("v")[0]
+            ),
+            "raw_match": match.group(),
+            "match_1": match[1],
+        }
@@ -0,0 +1,158 @@
+"""两阶段整理：plan 解析元数据并生成整理计划，apply 离线执行计划
+
+计划文件为 JSON（以 .gz 结尾时压缩），源路径相对输入文件夹、目标路径相对番剧目录保存，
+因此可以在一台机器上生成计划，在挂载路径不同的另一台机器（如 NAS）上执行。
+不同挂载方式下修改时间的精度不同（SMB/CIFS 为 100ns），校验源文件时只比较到整秒。
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from ani_sort.core import AniSort
+from ani_sort.manifest import fingerprint
+
+PLAN_VERSION = 1
+
+# 比较修改时间的精度
+MTIME_RESOLUTION_NS = 1_000_000_000
+
+# 计划中保存的元数据属性；apply 时 ani_info 交给 AniSort，字幕组与标签原样恢复，
+# 其余属性由 ani_info 推导，与计划中的值一致
+METADATA_ATTRS = [
+    "ani_info",
+    "season",
+    "ani_name",
+    "extra_info",
+    "group_name",
+    "tmdb_id",
+    "media_type",
+    "poster_path",
+    "season_poster_path",
+]
+
+
+class PlanError(Exception):
+    pass
+
+
+def _portable(fp: list | None) -> list | None:
+    """跨机器可比较的指纹部分：(大小, 修改时间)"""
+    return fp[2:] if fp else None
+
+
+def _unchanged(planned: list | None, fp: list | None) -> bool:
+    """源文件的大小与修改时间（截断到整秒）是否与计划中一致"""
+    if not planned or not fp:
+        return False
+    size, mtime_ns = _portable(fp)
+    return size == planned[0] and (
+        mtime_ns // MTIME_RESOLUTION_NS == planned[1] // MTIME_RESOLUTION_NS
+    )
+
+
+def build_plan(sorter: AniSort) -> dict:
+    """由已完成解析的 AniSort 生成计划"""
+    parent_dir = Path(sorter.parent_dir)
+    files = []
+    for src, dest in sorter.table.items():
+        rel_src = os.path.relpath(src, sorter.path)
+        rel_dest = dest if dest == "ignore" else os.path.relpath(dest, parent_dir)
+        files.append([rel_src, rel_dest, _portable(sorter.fingerprints.get(src))])
+
+    dirs = sorted(
+        {str(Path(dest).parent) for _, dest, _ in files if dest != "ignore"} - {"."}
+    )
+    return {
+        "version": PLAN_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "input": str(sorter.path),
+        "output_root": str(parent_dir.parent),
+        "series_dir": parent_dir.name,
+        "metadata": {
+            attr: getattr(sorter, attr)
+            for attr in METADATA_ATTRS
+            if hasattr(sorter, attr)
+        },
+        "dirs": dirs,
+        "files": files,
+    }
+
+
+def write_plan(plan: dict, path: str | Path) -> None:
+    path = Path(path)
+    data = json.dumps(plan, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".gz":
+        data = gzip.compress(data)
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def read_plan(path: str | Path) -> dict:
+    data = Path(path).read_bytes()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    plan = json.loads(data)
+    if plan.get("version") != PLAN_VERSION:
+        raise PlanError(
+            f"不支持的计划版本：{plan.get('version')}（当前为 {PLAN_VERSION}）"
+        )
+    return plan
+
+
+def sorter_from_plan(
+    plan: dict,
+    config,
+    logger,
+    input_path=None,
+    output_dir=None,
+    skip_changed: bool = False,
+) -> AniSort:
+    """按计划恢复 AniSort，不访问网络
+
+    input_path / output_dir: 覆盖计划中的输入文件夹与输出根目录
+    skip_changed: 源文件在计划后被修改或删除时跳过它们，默认直接报错
+    """
+    path = Path(input_path or plan["input"])
+    output_root = Path(output_dir or plan["output_root"])
+    metadata = plan["metadata"]
+    ani_info = dict(metadata["ani_info"])
+    if metadata.get("season_poster_path"):
+        ani_info.setdefault("season_poster_path", metadata["season_poster_path"])
+
+    table = {}
+    changed = []
+    for rel_src, rel_dest, planned in plan["files"]:
+        src = str(path / rel_src)
+        if rel_dest != "ignore":
+            try:
+                fp = fingerprint(src)
+            except OSError:
+                fp = None
+            if not _unchanged(planned, fp):
+                changed.append(src)
+                continue
+        table[src] = rel_dest
+
+    if changed:
+        for src in changed[:20]:
+            logger.warning(f"Source changed since planning: {src}")
+        if not skip_changed:
+            raise PlanError(
+                f"{len(changed)} 个源文件在生成计划后发生了变化，请重新生成计划"
+            )
+
+    # 元数据与文件表来自计划，构造时不查询元数据也不扫描文件夹
+    sorter = AniSort(path, output_root, config, logger, ani_info=ani_info, table=table)
+    if (series_dir := Path(sorter.parent_dir).name) != plan["series_dir"]:
+        raise PlanError(f"番剧目录 {series_dir} 与计划中的 {plan['series_dir']} 不一致")
+    # 字幕组等标签取自生成计划时的文件夹名，输入文件夹改名后仍按计划记录
+    sorter.extra_info = metadata.get("extra_info", sorter.extra_info)
+    sorter.group_name = metadata.get("group_name", sorter.group_name)
+    logger.info(
+        f"[TASK {sorter.task_id}] Applying plan: {path} "
+        f"({len(sorter.table)} file(s), {len(changed)} skipped)"
+    )
+    return sorter
@@ -0,0 +1,354 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from ani_sort.db import SessionLocal, Job, WatchedFolder
+from ani_sort.config_manager import load_config
+from ani_sort.task import run_sort_task
+from ani_sort.resolver import MetadataPrefetcher
+
+logger = logging.getLogger("AniSort")
+
+
+class JobQueue:
+    """基于数据库的整理任务队列
+
+    任务按 priority 降序、入队顺序执行；同一文件夹同时只有一个排队中或执行中的任务。
+    执行中的任务持有租约，worker 定期续约；租约过期（进程崩溃等）的任务重新入队，
+    超过 max_attempts 次则标记为失败。任务失败后监视文件夹恢复为 detected，可重新整理。
+    """
+
+    def __init__(self, lease_seconds: float = 300, max_attempts: int = 3) -> None:
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+
+    def enqueue(
+        self, input_path: str, folder_id: int | None = None, priority: int = 0
+    ) -> tuple[int, bool]:
+        """加入队列，返回 (任务 ID, 是否新建)；已在队列中时只提升优先级"""
+        with SessionLocal() as db:
+            if (existing := self._active(db, folder_id)) is not None:
+                if priority > existing.priority:
+                    existing.priority = priority
+                    db.commit()
+                return existing.id, False
+
+            job = Job(
+                folder_id=folder_id,
+                input_path=str(input_path),
+                priority=priority,
+                max_attempts=self.max_attempts,
+            )
+            db.add(job)
+            if folder_id is not None:
+                db.query(WatchedFolder).filter_by(id=folder_id).update(
+                    {"status": "queued"}
+                )
+            try:
+                db.commit()
+            except IntegrityError:
+                # 并发入队，另一请求已创建
+                db.rollback()
+                return self._active(db, folder_id).id, False
+            return job.id, True
+
+    def _active(self, db, folder_id):
+        if folder_id is None:
+            return None
+        return (
+            db.query(Job)
+            .filter(Job.folder_id == folder_id, Job.status.in_(["queued", "running"]))
+            .first()
+        )
+
+    def claim(self, worker: str) -> dict | None:
+        """领取下一个任务；用条件更新保证多个 worker/进程不会领取同一任务"""
+        with SessionLocal() as db:
+            while True:
+                job = (
+                    db.query(Job)
+                    .filter(Job.status == "queued")
+                    .order_by(Job.priority.desc(), Job.id)
+                    .first()
+                )
+                if job is None:
+                    return None
+                claimed = {
+                    "id": job.id,
+                    "folder_id": job.folder_id,
+                    "input_path": job.input_path,
+                    "attempts": job.attempts + 1,
+                }
+                now = datetime.now()
+                updated = (
+                    db.query(Job)
+                    .filter(Job.id == job.id, Job.status == "queued")
+                    .update(
+                        {
+                            "status": "running",
+                            "worker": worker,
+                            "attempts": Job.attempts + 1,
+                            "started_at": now,
+                            "lease_until": now + self.lease,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if updated:
+                    return claimed
+
+    def upcoming(self, limit: int) -> list[str]:
+        """按执行顺序返回排队中的前 limit 个任务的输入路径"""
+        with SessionLocal() as db:
+            rows = (
+                db.query(Job.input_path)
+                .filter(Job.status == "queued")
+                .order_by(Job.priority.desc(), Job.id)
+                .limit(limit)
+                .all()
+            )
+        return [path for (path,) in rows]
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """续约；任务已被回收时返回 False"""
+        with SessionLocal() as db:
+            updated = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.worker == worker, Job.status == "running")
+                .update(
+                    {"lease_until": datetime.now() + self.lease},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return bool(updated)
+
+    def finish(self, job_id: int, worker: str, error: str | None = None) -> None:
+        with SessionLocal() as db:
+            updated = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.worker == worker)
+                .update(
+                    {
+                        "status": "failed" if error else "done",
+                        "finished_at": datetime.now(),
+                        "lease_until": None,
+                        "error_msg": error,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated and error:
+                folder_id = db.query(Job.folder_id).filter_by(id=job_id).scalar()
+                _release_folder(db, folder_id)
+            db.commit()
+
+    def recover_expired(self) -> int:
+        """回收租约过期的任务：未超过重试次数的重新入队，否则标记失败"""
+        now = datetime.now()
+        with SessionLocal() as db:
+            expired = (
+                db.query(Job)
+                .filter(Job.status == "running", Job.lease_until < now)
+                .all()
+            )
+            for job in expired:
+                if job.attempts < job.max_attempts:
+                    logger.warning(f"[Queue] Lease expired, requeue job {job.id}")
+                    job.status, job.worker, job.lease_until = "queued", None, None
+                else:
+                    logger.error(
+                        f"[Queue] Job {job.id} failed after {job.attempts} attempts"
+                    )
+                    job.status, job.finished_at = "failed", now
+                    job.error_msg = "lease expired too many times"
+                    _release_folder(db, job.folder_id)
+            db.commit()
+            return len(expired)
+
+    def stats(self) -> dict:
+        """队列深度与等待时间（秒）"""
+        now = datetime.now()
+        with SessionLocal() as db:
+            counts = dict(
+                db.query(Job.status, func.count(Job.id)).group_by(Job.status).all()
+            )
+            queued = [
+                t for (t,) in db.query(Job.enqueued_at).filter(Job.status == "queued")
+            ]
+            recent = (
+                db.query(Job.enqueued_at, Job.started_at)
+                .filter(Job.started_at.isnot(None))
+                .order_by(Job.started_at.desc())
+                .limit(100)
+                .all()
+            )
+
+        waits = [(now - t).total_seconds() for t in queued]
+        started = [(s - e).total_seconds() for e, s in recent]
+        return {
+            "depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "counts": counts,
+            "oldest_wait": max(waits, default=0.0),
+            "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+            "avg_start_wait": sum(started) / len(started) if started else 0.0,
+        }
+
+
+def _release_folder(db, folder_id: int | None) -> None:
+    """任务失败后把仍处于排队/整理中的监视文件夹恢复为 detected，Web 界面可重新整理"""
+    if folder_id is None:
+        return
+    db.query(WatchedFolder).filter(
+        WatchedFolder.id == folder_id,
+        WatchedFolder.status.in_(["queued", "processing"]),
+    ).update({"status": "detected"}, synchronize_session=False)
+
+
+class JobWorkerPool:
+    """在后台线程中执行队列任务，同时执行的任务数不超过 workers
+    prefetcher: 领取任务时预解析排在后面的文件夹的元数据，结果随任务交给 runner
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        workers: int = 2,
+        poll_interval: float = 2.0,
+        runner=None,
+        prefetcher: MetadataPrefetcher | None = None,
+    ) -> None:
+        self.queue = queue
+        self.prefetcher = prefetcher
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.runner = runner or _run_job
+        self.prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads: list = []
+
+    def start(self) -> None:
+        self.queue.recover_expired()
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._loop,
+                args=(f"{self.prefix}-{i}",),
+                name=f"anisort-worker-{i}",
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+        logger.info(f"[Queue] Started {self.workers} worker(s)")
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+
+    def _loop(self, worker: str) -> None:
+        while not self._stop.is_set():
+            try:
+                self.queue.recover_expired()
+                job = self.queue.claim(worker)
+            except Exception as e:
+                logger.error(f"[Queue] Failed to claim job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            if self.prefetcher is not None:
+                self._prefetch(job)
+            self._execute(job, worker)
+
+    def _prefetch(self, job: dict) -> None:
+        try:
+            upcoming = self.queue.upcoming(self.prefetcher.limit)
+        except Exception as e:
+            logger.warning(f"[Queue] Failed to list upcoming jobs: {e}")
+            upcoming = []
+        self.prefetcher.submit([job["input_path"], *upcoming])
+        job["resolved"] = self.prefetcher.take(job["input_path"])
+
+    def _execute(self, job: dict, worker: str) -> None:
+        done = threading.Event()
+        interval = self.queue.lease.total_seconds() / 3
+
+        def _heartbeat():
+            while not done.wait(interval):
+                try:
+                    self.queue.heartbeat(job["id"], worker)
+                except Exception as e:
+                    logger.warning(f"[Queue] Heartbeat failed for job {job['id']}: {e}")
+
+        beat = threading.Thread(target=_heartbeat, daemon=True)
+        beat.start()
+        logger.info(f"[Queue] {worker} running job {job['id']}: {job['input_path']}")
+        error = None
+        try:
+            self.runner(job)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"[Queue] Job {job['id']} failed: {e}")
+        finally:
+            done.set()
+            beat.join()
+        self.queue.finish(job["id"], worker, error)
+
+
+def _run_job(job: dict) -> None:
+    run_sort_task(input_path=job["input_path"], resolved=job.get("resolved"))
+
+
+_queue: JobQueue | None = None
+_pool: JobWorkerPool | None = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(config=None) -> JobQueue:
+    """获取进程内共享的任务队列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if config is not None:
+                _queue = JobQueue(
+                    lease_seconds=config.queue.lease_seconds,
+                    max_attempts=config.queue.max_attempts,
+                )
+            else:
+                _queue = JobQueue()
+    return _queue
+
+
+def start_job_workers(config) -> JobWorkerPool:
+    """启动后台 worker（每个进程只启动一次）"""
+    global _pool
+    queue = get_job_queue(config)
+    with _queue_lock:
+        if _pool is None:
+            prefetcher = None
+            # 手动选择结果需要逐个输入，不预解析
+            if not config.tmdb.manual:
+                prefetcher = MetadataPrefetcher(load_config, config.tmdb.concurrency)
+            _pool = JobWorkerPool(
+                queue,
+                workers=config.queue.workers,
+                poll_interval=config.queue.poll_interval,
+                prefetcher=prefetcher,
+            )
+            _pool.start()
+    return _pool
+
+
+def stop_job_workers(timeout: float | None = None) -> None:
+    global _pool
+    with _queue_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop(timeout)
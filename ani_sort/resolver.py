@@ -0,0 +1,98 @@
+"""并发解析多个文件夹的元数据
+
+批量整理时在线程池中并发解析全部文件夹，哪个文件夹先解析完就先交给它的任务，
+不必等全部解析完；队列 worker 领取任务时在后台预解析排在后面的文件夹。
+HTTP 客户端是同步的连接池，每个文件夹在线程中执行 resolve_metadata，
+TMDB 的限流仍由 HttpClient 负责。
+解析时的日志与耗时先暂存，任务开始时写入任务的日志与 Task.timings。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from ani_sort.logging import BufferedLogger
+from ani_sort.metadata import resolve_metadata
+from ani_sort import metrics
+
+
+class ResolvedFolder(object):
+    """单个文件夹的解析结果：元数据（失败时为 None）或异常，以及暂存的日志与耗时"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.info: dict | None = None
+        self.error: Exception | None = None
+        self.log = BufferedLogger()
+        self.timer = metrics.StageTimer()
+
+    def replay(self, logger, timer: metrics.StageTimer | None = None) -> None:
+        """把解析时的日志写入任务的 logger，各阶段耗时计入任务的 StageTimer"""
+        self.log.flush(logger)
+        if timer is not None:
+            for name, seconds in self.timer.stages.items():
+                timer.add(name, seconds)
+
+
+def resolve_folder(name: str, config=None) -> ResolvedFolder:
+    result = ResolvedFolder(name)
+    with metrics.track(result.timer), metrics.stage("metadata"):
+        try:
+            result.info = resolve_metadata(name, config, result.log)
+        except Exception as e:
+            result.error = e
+    return result
+
+
+def iter_resolved(names: list[str], config=None, limit: int | None = None):
+    """并发解析多个文件夹名，按解析完成的顺序逐个产出 ResolvedFolder
+    limit: 同时解析的文件夹数，默认 tmdb.concurrency
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return
+    workers = min(len(names), max(1, limit or config.tmdb.concurrency))
+    with ThreadPoolExecutor(workers, thread_name_prefix="anisort-meta") as pool:
+        futures = [pool.submit(resolve_folder, name, config) for name in names]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class MetadataPrefetcher(object):
+    """在后台预解析队列中即将执行的文件夹，任务开始时直接取用结果
+
+    config_loader: 每次解析时取得配置（配置文件修改后立即生效）
+    limit: 同时解析的文件夹数，同时也是最多预解析的文件夹数
+    """
+
+    def __init__(self, config_loader, limit: int = 8) -> None:
+        self.config_loader = config_loader
+        self.limit = max(1, limit)
+        self._pool = ThreadPoolExecutor(self.limit, thread_name_prefix="anisort-meta")
+        self._futures: dict = {}
+        self._lock = threading.Lock()
+
+    def submit(self, paths: list[str]) -> None:
+        """预解析 paths（按执行顺序），已不在其中的已完成结果视为过期并丢弃"""
+        with self._lock:
+            for path in [p for p, f in self._futures.items() if f.done()]:
+                if path not in paths:
+                    del self._futures[path]
+            for path in paths:
+                if path in self._futures or len(self._futures) >= 2 * self.limit:
+                    continue
+                self._futures[path] = self._pool.submit(
+                    resolve_folder, Path(path).stem, self.config_loader()
+                )
+
+    def take(self, path: str) -> ResolvedFolder | None:
+        """取出文件夹的预解析结果（仍在解析时等待完成），未预解析时返回 None"""
+        with self._lock:
+            future = self._futures.pop(path, None)
+        return future.result() if future is not None else None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.cancel()
+        self._pool.shutdown(wait=False)
@@ -1,7 +1,17 @@
 import subprocess
 import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
+from ani_sort.logging import BufferedLogger
+from ani_sort.fonts import (
+    FontCache,
+    ass_font_usage,
+    font_signature,
+    write_union_ass,
+)
 
 
 def run_cmd(cmd, logger, cwd=None):
@@ -22,22 +32,214 @@ def run_cmd(cmd, logger, cwd=None):
     return True
 
 
-def subset_ass_fonts(target_dir: str | Path, logger: logging.Logger | None = None):
+def build_subset_fonts(ass_file: Path, subset_dir: Path, logger) -> bool:
+    """抽取 ASS 文件用到的字体并子集化到 subset_dir（必要时 OTF → TTF）"""
+    # Step 1: 抽取字体
+    logger.info(f"1. 抽取并子集化字体到 {subset_dir}")
+    if not run_cmd(
+        ["assfonts", "-o", str(subset_dir), "-s", "-i", str(ass_file)], logger
+    ):
+        logger.warning(f"跳过该文件，因字体子集化失败: {ass_file}")
+        return False
+
+    # Step 2: 转换 OTF → TTF（如果 otf2ttf 可用）
+    otf_files = list(subset_dir.glob("*.otf"))
+    if otf_files and shutil.which("otf2ttf"):
+        logger.info("2. 检测到 OTF 字体，转换为 TTF...")
+        result = subprocess.run(
+            ["otf2ttf", *map(str, otf_files)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+        logger.debug(result.stdout)
+    return True
+
+
+def embed_subset_fonts(ass_file: Path, subset_dir: Path, logger) -> bool:
+    """把 subset_dir 中的子集字体嵌入 ASS 文件，成功后把原文件移入 old_sub"""
+    # Step 3: 嵌入子集字体
+    logger.info("3. 将子集化字体嵌入到 ASS 文件中...")
+    if not run_cmd(["assfonts", "-f", str(subset_dir), "-i", str(ass_file)], logger):
+        logger.warning(f"跳过该文件，因嵌入阶段失败: {ass_file}")
+        return False
+
+    # Step 4: 备份原文件
+    backup_dir = ass_file.parent / "old_sub"
+    backup_dir.mkdir(exist_ok=True)
+    logger.info(f"4. 移动原字幕文件到 {backup_dir}")
+    shutil.move(str(ass_file), str(backup_dir / ass_file.name))
+    return True
+
+
+def subset_ass_file(ass_file: Path, logger) -> bool:
+    """对单个 ASS 文件执行字体子集化和嵌入，成功后把原文件移入 old_sub。"""
+    logger.info("=" * 50)
+    logger.info(f"处理文件: {ass_file}")
+
+    # 每个文件使用独立的临时目录，并行处理时互不干扰
+    subset_dir = Path(
+        tempfile.mkdtemp(
+            prefix=f"{ass_file.stem}_", suffix="_subsetted", dir=ass_file.parent
+        )
+    )
+
+    try:
+        return build_subset_fonts(ass_file, subset_dir, logger) and (
+            embed_subset_fonts(ass_file, subset_dir, logger)
+        )
+    finally:
+        # Step 5: 清理
+        logger.info(f"5. 删除临时文件夹 {subset_dir}")
+        shutil.rmtree(subset_dir, ignore_errors=True)
+
+
+def _font_usages(ass_files: list[Path], pool, logger) -> dict[Path, dict]:
+    """一次性解析所有 ASS 文件的字体需求，解析失败的文件不包含在内"""
+
+    def _usage(ass_file):
+        try:
+            return ass_file, ass_font_usage(ass_file)
+        except Exception as e:
+            logger.warning(f"无法解析字幕字体，将单独处理 {ass_file}: {e}")
+            return ass_file, None
+
+    return {f: usage for f, usage in pool.map(_usage, ass_files) if usage}
+
+
+def _face_subset_dir(face: tuple, glyphs: set, cache: FontCache, logger):
+    """取得单个字体（字体名, 粗体, 斜体）对给定字形集合的子集：
+    命中缓存直接返回，否则子集化一次后写入缓存
+    """
+    usage = {face: glyphs}
+    signature = font_signature(usage)
+    if (entry := cache.get(signature)) is not None:
+        logger.debug(f"字体缓存命中: {face[0]} ({len(glyphs)} 字) {signature}")
+        return entry
+
+    logger.info(f"字体缓存未命中，子集化 {face[0]} ({len(glyphs)} 字): {signature}")
+    staging = cache.staging_dir(signature)
+    with tempfile.TemporaryDirectory(dir=cache.cache_dir) as tmp:
+        face_ass = write_union_ass(usage, Path(tmp) / f"{signature}.ass")
+        try:
+            ok = build_subset_fonts(face_ass, staging, logger)
+        except Exception as e:
+            logger.error(f"子集化字体时发生错误: {e}")
+            ok = False
+    if not ok:
+        shutil.rmtree(staging, ignore_errors=True)
+        return None
+    return cache.put(signature, staging)
+
+
+def embed_cached_fonts(ass_file: Path, entries: list[Path], logger) -> bool:
+    """把该文件用到的各字体子集收集到临时目录后嵌入"""
+    font_dir = Path(
+        tempfile.mkdtemp(
+            prefix=f"{ass_file.stem}_", suffix="_subsetted", dir=ass_file.parent
+        )
+    )
+    try:
+        for i, entry in enumerate(entries):
+            for font in entry.iterdir():
+                if font.is_file() and not font.name.startswith("."):
+                    # 不同字体的子集可能同名，加序号区分
+                    shutil.copy2(font, font_dir / f"{i}_{font.name}")
+        return embed_subset_fonts(ass_file, font_dir, logger)
+    finally:
+        shutil.rmtree(font_dir, ignore_errors=True)
+
+
+def _subset_with_cache(ass_files, cache: FontCache, pool, logger):
+    """先汇总整个系列中每个字体（字体名, 粗体, 斜体）用到的全部字形，
+    每个字体按字形并集只子集化一次并缓存，各文件嵌入自己用到的字体子集；
+    嵌入全部完成后才按缓存上限淘汰，避免淘汰本次仍要使用的条目
+    """
+    usages = _font_usages(ass_files, pool, logger)
+    union: dict = {}  # 字体 -> 所有文件的字形并集
+    for usage in usages.values():
+        for face, glyphs in usage.items():
+            union.setdefault(face, set()).update(glyphs)
+
+    def _build(face):
+        buffer = BufferedLogger()
+        entry = _face_subset_dir(face, union[face], cache, buffer)
+        return face, entry, buffer
+
+    hits, misses = cache.hits, cache.misses
+    entries: dict = {}  # 字体 -> 缓存条目（失败时为 None）
+    for face, entry, buffer in pool.map(_build, union):
+        buffer.flush(logger)
+        entries[face] = entry
+    if union:
+        logger.info(
+            f"字体子集 {len(union)} 个：缓存命中 {cache.hits - hits}，"
+            f"新建 {cache.misses - misses}"
+        )
+
+    def _process(ass_file):
+        buffer = BufferedLogger()
+        start = time.monotonic()
+        faces = list(usages.get(ass_file, ()))
+        try:
+            ok = None
+            if faces and all(entries[face] is not None for face in faces):
+                buffer.info("=" * 50)
+                buffer.info(f"处理文件: {ass_file}（使用 {len(faces)} 个缓存字体子集）")
+                try:
+                    ok = embed_cached_fonts(
+                        ass_file, [entries[face] for face in faces], buffer
+                    )
+                except FileNotFoundError as e:
+                    # 条目已被其他任务淘汰
+                    buffer.warning(f"缓存字体子集已不存在，改为单独处理: {e}")
+            if ok is None:
+                ok = subset_ass_file(ass_file, buffer)
+        except Exception as e:
+            buffer.error(f"处理 {ass_file} 时发生错误: {e}")
+            ok = False
+        return _finish(ass_file, ok, start, buffer)
+
+    yield from pool.map(_process, ass_files)
+
+    try:
+        cache.evict(keep={e for e in entries.values() if e is not None})
+    except OSError as e:
+        logger.warning(f"淘汰字体缓存失败: {e}")
+
+
+def _finish(ass_file, ok, start, buffer):
+    elapsed = time.monotonic() - start
+    if ok:
+        buffer.info(f"文件处理完成: {ass_file} ({elapsed:.2f}s)")
+    return buffer, {"file": str(ass_file), "success": ok, "duration": elapsed}
+
+
+def subset_ass_fonts(
+    target_dir: str | Path,
+    logger: logging.Logger | None = None,
+    workers: int = 1,
+    cache: FontCache | None = None,
+) -> list[dict]:
     """
     对目标文件夹内的所有 ASS 文件执行字体子集化和嵌入操作。
     要求系统安装 assfonts & otf2ttf。
+    workers: 并行处理的文件数，日志仍按文件顺序输出。
+    cache: 字体缓存；每个字体按整个系列的字形并集只子集化一次，并跨任务复用。
+    返回每个文件的处理结果与耗时。
     """
     logger = logger or logging.getLogger("AniSort")
     target_dir = Path(target_dir)
 
     if not target_dir.exists() or not target_dir.is_dir():
         logger.error(f"目标路径无效: {target_dir}")
-        return
+        return []
 
     # 检查依赖
     if not shutil.which("assfonts"):
         logger.error("assfonts 未安装或不在 PATH 中。请先安装。")
-        return
+        return []
     if not shutil.which("otf2ttf"):
         logger.warning("otf2ttf 未安装，将跳过 OTF→TTF 转换。")
 
@@ -45,57 +247,37 @@ def subset_ass_fonts(target_dir: str | Path, logger: logging.Logger | None = Non
     logger.info(f"目标目录: {target_dir}")
 
     ignore_dirs = {"old_sub", "subsetted"}
-    ass_files = [
+    ass_files = sorted(
         f
         for f in target_dir.rglob("*.ass")
         if not any(p.name in ignore_dirs for p in f.parents)
-    ]
-
-    for ass_file in ass_files:
-        logger.info("=" * 50)
-        logger.info(f"处理文件: {ass_file}")
-
-        subset_dir = ass_file.parent / f"{ass_file.stem}_subsetted"
-        backup_dir = ass_file.parent / "old_sub"
-
-        # 清理并准备输出目录
-        if subset_dir.exists():
-            shutil.rmtree(subset_dir)
-        subset_dir.mkdir(exist_ok=True)
-        backup_dir.mkdir(exist_ok=True)
-
-        # Step 1: 抽取字体
-        logger.info(f"1. 抽取并子集化字体到 {subset_dir}")
-        if not run_cmd(
-            ["assfonts", "-o", str(subset_dir), "-s", "-i", str(ass_file)], logger
-        ):
-            logger.warning(f"跳过该文件，因字体子集化失败: {ass_file}")
-            shutil.rmtree(subset_dir, ignore_errors=True)
-            continue
-
-        # Step 2: 转换 OTF → TTF（如果 otf2ttf 可用）
-        otf_files = list(subset_dir.glob("*.otf"))
-        if otf_files and shutil.which("otf2ttf"):
-            logger.info("2. 检测到 OTF 字体，转换为 TTF...")
-            subprocess.run(["otf2ttf", *map(str, otf_files)], check=False)
-
-        # Step 3: 嵌入子集字体
-        logger.info("3. 将子集化字体嵌入到 ASS 文件中...")
-        if not run_cmd(
-            ["assfonts", "-f", str(subset_dir), "-i", str(ass_file)], logger
-        ):
-            logger.warning(f"跳过该文件，因嵌入阶段失败: {ass_file}")
-            shutil.rmtree(subset_dir, ignore_errors=True)
-            continue
-
-        # Step 4: 清理
-        logger.info(f"4. 删除临时文件夹 {subset_dir}")
-        shutil.rmtree(subset_dir, ignore_errors=True)
+    )
 
-        # Step 5: 备份原文件
-        logger.info(f"5. 移动原字幕文件到 {backup_dir}")
-        shutil.move(str(ass_file), str(backup_dir / ass_file.name))
+    def _process(ass_file):
+        buffer = BufferedLogger()
+        start = time.monotonic()
+        try:
+            ok = subset_ass_file(ass_file, buffer)
+        except Exception as e:
+            buffer.error(f"处理 {ass_file} 时发生错误: {e}")
+            ok = False
+        return _finish(ass_file, ok, start, buffer)
 
-        logger.info(f"文件处理完成: {ass_file}")
+    start = time.monotonic()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if cache is not None:
+            processed = _subset_with_cache(ass_files, cache, pool, logger)
+        else:
+            processed = pool.map(_process, ass_files)
+        # 按提交顺序输出，保证日志按文件顺序
+        for buffer, result in processed:
+            buffer.flush(logger)
+            results.append(result)
 
-    logger.info("--- 所有 ASS 文件处理完毕 ---")
+    succeeded = sum(r["success"] for r in results)
+    logger.info(
+        f"--- 所有 ASS 文件处理完毕：成功 {succeeded}/{len(results)}，"
+        f"耗时 {time.monotonic() - start:.2f}s ---"
+    )
+    return results
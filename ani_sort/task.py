@@ -1,10 +1,39 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from pathlib import Path
 from ani_sort.core import AniSort
+from ani_sort.plan import sorter_from_plan
 from ani_sort.logging import setup_logger
 from ani_sort.config_manager import load_config
+from ani_sort.metadata import prefetch_ai_titles
+from ani_sort.resolver import ResolvedFolder, iter_resolved
+from ani_sort.artwork import get_artwork_store
 from ani_sort.db import SessionLocal, Task, get_or_create_anime, WatchedFolder
+from ani_sort import metrics
 
 
+def _save_timings(task_id, timer: metrics.StageTimer, status: str, logger) -> None:
+    """把各阶段耗时写入 Task.timings，并计入 /metrics"""
+    timer.observe(status)
+    timings = timer.as_dict()
+    logger.info(
+        "Stage timings: " + ", ".join(f"{k}={v:.3f}s" for k, v in timings.items())
+    )
+    session = SessionLocal()
+    try:
+        session.query(Task).filter_by(id=task_id).update({"timings": timings})
+        session.commit()
+    except Exception as e:
+        logger.warning(f"Failed to save task timings: {e}")
+        session.rollback()
+    finally:
+        session.close()
+
+
+@metrics.tracked
 def run_sort_task(
     input_path,
     output_dir=None,
@@ -14,9 +43,23 @@ def run_sort_task(
     move: bool | None = None,
     subset: bool | None = None,
     is_cli: bool = False,
+    config=None,
+    link_slots=None,
+    plan: dict | None = None,
+    skip_changed: bool = False,
+    resolved: ResolvedFolder | None = None,
 ):
-
-    config = load_config()
+    """执行单个整理任务
+    config: 共享的配置对象，默认重新加载
+    link_slots: 限制文件系统操作并发数的信号量，默认不限制
+    plan: 由 plan 命令生成的整理计划，给定时不再查询元数据（见 ani_sort.plan）
+    skip_changed: 执行计划时跳过计划后发生变化的源文件，默认任务失败
+    resolved: 预先解析好的元数据（见 ani_sort.resolver），解析失败时在任务中重新解析
+    """
+    timer = metrics.current()
+    with metrics.stage("config"):
+        config = config or load_config()
+    link_slots = link_slots or nullcontext()
     effective_dryrun = dryrun if is_cli and dryrun is not None else False
     effective_move = (
         move
@@ -47,6 +90,7 @@ def run_sort_task(
     )
     session.add(task)
     session.commit()
+    task_id = task.id
 
     watched = session.query(WatchedFolder).filter_by(path=input_path).first()
     if watched:
@@ -54,9 +98,20 @@ def run_sort_task(
         watched.task_id = task.id
         session.commit()
 
+    ani_info = None
+    if resolved is not None:
+        resolved.replay(logger, timer)
+        ani_info = resolved.info
+
     try:
-        sorter = AniSort(input_path, output_dir, config, logger)
-        sorter.process(dryrun=effective_dryrun)
+        if plan is not None:
+            sorter = sorter_from_plan(
+                plan, config, logger, input_path, output_dir, skip_changed
+            )
+        else:
+            sorter = AniSort(input_path, output_dir, config, logger, ani_info)
+        with link_slots:
+            sorter.process(dryrun=effective_dryrun)
         task.status = "success"
         task.output_path = sorter.parent_dir
         task.ended_at = datetime.now()
@@ -70,6 +125,7 @@ def run_sort_task(
             sorter.tmdb_id,
             sorter.poster_path,
         )
+        anime.media_type = sorter.media_type
         anime.status = "done"
         anime.last_updated = datetime.now()
         task.anime_id = anime.id
@@ -81,6 +137,8 @@ def run_sort_task(
         task.error_msg = str(e)
         logger.error(f"Task failed during execution: {str(e)}")
         session.merge(task)
+        timer.observe("failed")
+        task.timings = timer.as_dict()
         raise
     finally:
         if session.is_active:
@@ -94,17 +152,121 @@ def run_sort_task(
         except Exception as e:
             logger.error(f"Commit failed: {e}")
             session.rollback()
+        finally:
+            session.close()
+
+    # 下载海报与缩略图供图库使用（执行计划时不访问网络，留给图库按需下载）
+    if (
+        not effective_dryrun
+        and plan is None
+        and (store := get_artwork_store(config)) is not None
+    ):
+        store.prefetch(sorter.poster_path, getattr(sorter, "season_poster_path", None))
 
-    # MoveOriginal
-    if effective_move:
-        sorter.move_original_folder(dryrun=effective_dryrun)
+    with link_slots:
+        # MoveOriginal
+        if effective_move:
+            sorter.move_original_folder(dryrun=effective_dryrun)
 
-    # Subset
-    if effective_subset:
-        sorter.subset_ass(dryrun=effective_dryrun)
+        # Subset
+        if effective_subset:
+            sorter.subset_ass(dryrun=effective_dryrun)
+
+    _save_timings(task_id, timer, "success", logger)
 
     return {
         "input": str(sorter.path),
         "output": str(sorter.parent_dir),
         "status": "success",
     }
+
+
+def expand_batch_inputs(paths: list, from_parent: bool = False) -> list[str]:
+    """展开批量任务的输入：from_parent 时把每个路径的一级子文件夹作为任务"""
+    inputs = []
+    for p in map(Path, paths):
+        if from_parent:
+            inputs.extend(str(d) for d in sorted(p.iterdir()) if d.is_dir())
+        else:
+            inputs.append(str(p))
+    return list(dict.fromkeys(inputs))
+
+
+def run_batch_tasks(
+    inputs: list[str],
+    output_dir=None,
+    *,
+    workers: int = 4,
+    link_workers: int = 1,
+    dryrun: bool | None = None,
+    verbose: bool | None = None,
+    move: bool | None = None,
+    subset: bool | None = None,
+) -> dict:
+    """并行执行多个整理任务并汇总结果
+    workers: 同时进行的任务数（元数据查询可并发）
+    link_workers: 同时进行链接/移动/子集化的任务数
+    """
+    config = load_config()
+    logger = setup_logger(verbose)
+    link_slots = threading.BoundedSemaphore(max(1, link_workers))
+
+    # AI 模式下先一次性批量解析所有文件夹名
+    try:
+        prefetch_ai_titles([Path(p).stem for p in inputs], config, logger)
+    except Exception as e:
+        logger.warning(f"Batch AI prefetch failed: {e}")
+
+    def _run(path, resolved=None):
+        start = time.monotonic()
+        try:
+            result = run_sort_task(
+                path,
+                output_dir,
+                dryrun=dryrun,
+                verbose=verbose,
+                move=move,
+                subset=subset,
+                is_cli=True,
+                config=config,
+                link_slots=link_slots,
+                resolved=resolved,
+            )
+        except Exception as e:
+            result = {"input": str(path), "output": None, "status": "failed"}
+            result["error"] = str(e)
+        result["duration"] = time.monotonic() - start
+        return result
+
+    start = time.monotonic()
+    tasks = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if config.tmdb.manual:
+            # 手动选择结果时需要逐个输入，在各任务中解析
+            for path in inputs:
+                tasks[path] = pool.submit(_run, path)
+        else:
+            # 并发解析元数据，每个文件夹解析完立即开始它的任务；
+            # 解析失败的文件夹在任务中重新解析并报告错误
+            stems: dict = {}
+            for path in inputs:
+                stems.setdefault(Path(path).stem, []).append(path)
+            failed = 0
+            for resolved in iter_resolved(list(stems), config):
+                failed += resolved.info is None
+                for path in stems[resolved.name]:
+                    tasks[path] = pool.submit(_run, path, resolved)
+            logger.info(
+                f"Resolved metadata for {len(stems)} folder(s) "
+                f"in {time.monotonic() - start:.2f}s ({failed} failed)"
+            )
+        results = [tasks[path].result() for path in inputs]
+
+    failed = [r for r in results if r["status"] != "success"]
+    return {
+        "total": len(results),
+        "success": len(results) - len(failed),
+        "failed": len(failed),
+        "duration": time.monotonic() - start,
+        "results": results,
+    }
@@ -0,0 +1,225 @@
+"""本地 TMDB 标题索引
+
+由 TMDB 每日发布的 ID 导出文件（gzip 压缩的 JSON Lines，每行含 id、原始标题与热度）
+流式导入 SQLite，FTS5 trigram 索引支持子串与近似标题搜索。tmdb.resolver 为 local 时，
+get_ani_info 先在本地解析标题，只在获取海报等详情时访问网络。
+
+    python main.py tmdb-index import tv_series_ids_05_01_2025.json.gz
+    python main.py tmdb-index import --download tv
+    python main.py tmdb-index search "Yuru Camp"
+"""
+
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from ani_sort.cache import normalize_stem
+
+INDEX_PATH = "data/tmdb_index.db"
+EXPORT_URL = "http://files.tmdb.org/p/exports/{prefix}_{day:%m_%d_%Y}.json.gz"
+EXPORT_PREFIXES = {"tv": "tv_series_ids", "movie": "movie_ids"}
+BATCH_SIZE = 5000  # 每批写入的行数，导入时内存占用与文件大小无关
+
+
+def export_url(media_type: str, day: date | None = None) -> str:
+    """ID 导出文件地址，默认取前一天（当天的文件 UTC 8 点左右才发布）"""
+    day = day or date.today() - timedelta(days=1)
+    return EXPORT_URL.format(prefix=EXPORT_PREFIXES[media_type], day=day)
+
+
+def guess_media_type(source: str) -> str | None:
+    name = os.path.basename(str(source))
+    for media_type, prefix in EXPORT_PREFIXES.items():
+        if name.startswith(prefix):
+            return media_type
+    return None
+
+
+def open_export(source: str, config=None):
+    """逐行读取导出文件，source 为本地路径或 URL（边下载边解压）"""
+    if str(source).startswith(("http://", "https://")):
+        from ani_sort.api import get_http_client
+
+        res = get_http_client("tmdb", config).get(
+            source,
+            stream=True,
+            proxies=config.general.proxies if config else None,
+        )
+        raw = res.raw
+    else:
+        raw = open(source, "rb")
+
+    with raw:
+        stream = gzip.GzipFile(fileobj=raw) if str(source).endswith(".gz") else raw
+        yield from io.TextIOWrapper(stream, encoding="utf-8")
+
+
+class TitleIndex:
+    """标题 -> TMDB ID 的本地索引"""
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS titles (
+                rowid INTEGER PRIMARY KEY,
+                tmdb_id INTEGER NOT NULL,
+                media_type TEXT NOT NULL,
+                title TEXT NOT NULL,
+                norm TEXT NOT NULL,
+                popularity REAL NOT NULL DEFAULT 0,
+                UNIQUE (media_type, tmdb_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_titles_norm ON titles (norm);
+            CREATE VIRTUAL TABLE IF NOT EXISTS titles_fts USING fts5(
+                title, content='titles', content_rowid='rowid', tokenize='trigram'
+            );
+            CREATE TABLE IF NOT EXISTS imports (
+                media_type TEXT PRIMARY KEY,
+                source TEXT,
+                rows INTEGER,
+                imported_at TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    def import_export(self, lines, media_type: str, source: str = "") -> int:
+        """用导出文件替换某一类型的全部条目，返回导入的行数
+
+        整个导入在一个事务中完成，期间其他连接仍读到旧数据；
+        逐批写入，内存占用只与 BATCH_SIZE 有关。
+        """
+        count = 0
+        batch = []
+        with self._lock:
+            conn = self._conn
+            try:
+                conn.execute("BEGIN")
+                conn.execute("DELETE FROM titles WHERE media_type = ?", (media_type,))
+                for line in lines:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    title = item.get("original_name") or item.get("original_title")
+                    if not title or item.get("adult") or item.get("video"):
+                        continue
+                    batch.append(
+                        (
+                            item["id"],
+                            media_type,
+                            title,
+                            normalize_stem(title),
+                            item.get("popularity") or 0,
+                        )
+                    )
+                    if len(batch) >= BATCH_SIZE:
+                        count += self._insert(batch)
+                        batch = []
+                count += self._insert(batch)
+                # 外部内容表：批量写入后整体重建全文索引
+                conn.execute("INSERT INTO titles_fts(titles_fts) VALUES ('rebuild')")
+                conn.execute(
+                    "INSERT OR REPLACE INTO imports VALUES (?, ?, ?, datetime('now'))",
+                    (media_type, str(source), count),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def _insert(self, batch: list) -> int:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO titles (tmdb_id, media_type, title, norm, popularity) "
+            "VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        return len(batch)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """按完全匹配、子串匹配、分词匹配依次查找，同级按热度排序"""
+        norm = normalize_stem(query)
+        if not norm:
+            return []
+        columns = "t.tmdb_id, t.media_type, t.title, t.popularity"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM titles t WHERE t.norm = ? "
+                "ORDER BY t.popularity DESC LIMIT ?",
+                (norm, limit),
+            ).fetchall()
+            # trigram 需要至少 3 个字符
+            if not rows and len(norm) >= 3:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM titles_fts f "
+                    "JOIN titles t ON t.rowid = f.rowid "
+                    "WHERE titles_fts MATCH ? ORDER BY t.popularity DESC LIMIT ?",
+                    (_phrase(norm), limit),
+                ).fetchall()
+            words = [w for w in norm.split() if len(w) >= 3]
+            if not rows and len(words) > 1:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM titles_fts f "
+                    "JOIN titles t ON t.rowid = f.rowid "
+                    "WHERE titles_fts MATCH ? ORDER BY f.rank, t.popularity DESC "
+                    "LIMIT ?",
+                    (" OR ".join(_phrase(w) for w in words), limit),
+                ).fetchall()
+        return [_result(*row) for row in rows]
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT media_type, rows, imported_at FROM imports"
+            ).fetchall()
+        return {m: {"rows": n, "imported_at": at} for m, n, at in rows}
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _result(tmdb_id, media_type, title, popularity) -> dict:
+    """与 /search/multi 结果相同的结构，日期与图片需要另行查询详情"""
+    key = "name" if media_type == "tv" else "title"
+    return {
+        "id": tmdb_id,
+        "media_type": media_type,
+        key: title,
+        f"original_{key}": title,
+        "popularity": popularity,
+        "first_air_date" if media_type == "tv" else "release_date": None,
+        "poster_path": None,
+        "backdrop_path": None,
+        "source": "local",
+    }
+
+
+_index: TitleIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_title_index(config=None) -> TitleIndex | None:
+    """获取进程内共享的标题索引，未启用本地解析或索引文件不存在时返回 None"""
+    global _index
+    if config is None or config.tmdb.resolver != "local":
+        return None
+    path = config.tmdb.index_path
+    if not Path(path).exists():
+        return None
+    with _index_lock:
+        if _index is None or _index.path != path:
+            _index = TitleIndex(path)
+    return _index
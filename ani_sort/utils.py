@@ -1,6 +1,9 @@
-from typing import List
+from typing import Iterator, List
 from pathlib import Path
-import difflib
+import os
+
+# 网络文件系统：收不到 inotify 事件（监听改用轮询），单次元数据操作延迟高（链接并发执行）
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs", "fuse.rclone"}
 
 
 def sanitize_filename(name: str) -> str:
@@ -21,22 +24,58 @@ def sanitize_filename(name: str) -> str:
     )
 
 
+def iter_files(path: Path) -> Iterator[Path]:
+    """逐层产出文件夹内所有文件（流式），同一层按路径长度、再按路径排序
+
+    与按 difflib 相似度排序等价：每个文件路径都以根路径为前缀，
+    相似度 2*len(root)/(len(root)+len(file)) 随路径变长单调递减。
+    """
+    if path.is_file():
+        yield path
+        return
+
+    level = [str(path)]
+    while level:
+        files, subdirs = [], []
+        for d in level:
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            # 与 rglob 一致：不进入符号链接指向的目录，避免重复与循环
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file():
+                                files.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+        files.sort(key=lambda f: (len(f), f))
+        for f in files:
+            yield Path(f)
+        level = subdirs
+
+
 def get_all_files(path: Path) -> List[Path]:
     """获取文件夹内所有文件，先按层级分类，再按相似度排序"""
-    if path.is_file():
-        return [path]
-
-    files_by_level = {}
-    for f in path.rglob("*"):
-        if f.is_file():
-            files_by_level.setdefault(len(f.relative_to(path).parts), []).append(f)
-
-    return [
-        file
-        for level in sorted(files_by_level.keys())
-        for file in sorted(
-            files_by_level[level],
-            key=lambda x: difflib.SequenceMatcher(None, str(x), str(path)).ratio(),
-            reverse=True,
-        )
-    ]
+    return list(iter_files(path))
+
+
+def filesystem_type(path: Path) -> str | None:
+    """从 /proc/mounts 查找 path 所在挂载点的文件系统类型"""
+    try:
+        mounts = Path("/proc/mounts").read_text().splitlines()
+    except OSError:
+        return None
+    best, fstype = "", None
+    for line in mounts:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        mount = parts[1].replace("\\040", " ")
+        inside = (str(path) + "/").startswith(mount.rstrip("/") + "/")
+        if inside and len(mount) > len(best):
+            best, fstype = mount, parts[2]
+    return fstype
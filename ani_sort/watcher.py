@@ -1,14 +1,122 @@
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from pathlib import Path
+import json
+import os
 import time
 import threading
+import uuid
+from ani_sort.utils import NETWORK_FS, filesystem_type
+
+# 下载工具写入中的临时文件扩展名（如 qBittorrent 的 .!qB）
+INCOMPLETE_EXTS = (".!qb", ".part", ".crdownload", ".tmp")
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "../data/watch_snapshot.json")
+SNAPSHOT_SAVE_DELAY = 1.0  # 合并这段时间内的多次变更后再写入快照
+
+
+def folder_signature(path: Path) -> tuple | None:
+    """统计文件夹的 (文件数, 总大小, 最新修改时间, 是否有未完成文件)，文件夹不存在时返回 None"""
+    count = size = latest = 0
+    incomplete = False
+    stack = [str(path)]
+    try:
+        latest = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    latest = max(latest, st.st_mtime_ns)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        count += 1
+                        size += st.st_size
+                        if entry.name.lower().endswith(INCOMPLETE_EXTS):
+                            incomplete = True
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return count, size, latest, incomplete
+
+
+class SettleTracker:
+    """等待文件夹写入完成：大小与修改时间在 settle_seconds 内保持不变后才回调
+
+    同一文件夹的多次事件合并为一条待检查记录。
+    """
+
+    def __init__(self, callback, settle_seconds: float = 60, interval: float = 5):
+        self.callback = callback
+        self.settle_seconds = settle_seconds
+        self.interval = interval
+        # path -> (上次签名, 签名开始稳定的时间)
+        self.pending: dict = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, path: Path) -> None:
+        with self._lock:
+            if path not in self.pending:
+                print(f"[Watcher] Waiting for folder to settle: {path}")
+            # 新事件说明仍在变化，重新计时
+            self.pending[path] = (None, time.monotonic())
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            self.pending.pop(path, None)
+
+    def check(self) -> list[Path]:
+        """检查一轮，返回已稳定并回调的文件夹"""
+        with self._lock:
+            items = list(self.pending.items())
+
+        settled = []
+        now = time.monotonic()
+        for path, (last, since) in items:
+            sig = folder_signature(path)
+            with self._lock:
+                if path not in self.pending or self.pending[path] != (last, since):
+                    continue  # 检查期间有新事件
+                if sig is None:
+                    del self.pending[path]
+                elif sig != last or sig[3]:
+                    self.pending[path] = (sig, now)
+                elif now - since >= self.settle_seconds:
+                    del self.pending[path]
+                    settled.append(path)
+
+        for path in settled:
+            print(f"[Watcher] Folder settled: {path}")
+            try:
+                self.callback(path)
+            except Exception as e:
+                print(f"[Watcher] Callback failed for {path}: {e}")
+        return settled
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
 
 
 class FolderWatcher(FileSystemEventHandler):
     def __init__(self, watch_path, callback):
         self.watch_path = Path(watch_path).resolve()
         self.callback = callback
+        self.on_removed = None
 
     def is_top_level_folder(self, path):
         try:
@@ -33,25 +141,191 @@ class FolderWatcher(FileSystemEventHandler):
     def on_deleted(self, event):
         if event.is_directory and self.is_top_level_folder(Path(event.src_path)):
             print(f"[Watcher] Folder deleted from watched/: {event.src_path}")
+            if self.on_removed:
+                self.on_removed(Path(event.src_path).resolve())
             # self.callback_deleted(Path(event.src_path))
 
 
-def start_watcher(path, callback):
-    observer = Observer()
-    handler = FolderWatcher(path, callback)
+def scan_folders(path: Path) -> dict:
+    """列出 path 下的一级文件夹：{名称: [inode, 修改时间]}"""
+    folders = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    st = entry.stat()
+                    folders[entry.name] = [st.st_ino, st.st_mtime_ns]
+            except FileNotFoundError:
+                continue
+    return folders
+
+
+def diff_folders(old: dict, new: dict) -> tuple[list, list]:
+    """返回 (新增或变化的文件夹名, 消失的文件夹名)"""
+    changed = [name for name, sig in new.items() if old.get(name) != sig]
+    removed = [name for name in old if name not in new]
+    return changed, removed
+
+
+class FolderSnapshot:
+    """已上报文件夹的持久化快照，重启后只需上报新增或变化的文件夹
+
+    变更后延迟 save_delay 秒写入，初次扫描等短时间内的大量变更只写一次。
+    """
+
+    def __init__(
+        self,
+        path: str | Path = SNAPSHOT_PATH,
+        root: Path | None = None,
+        save_delay: float = SNAPSHOT_SAVE_DELAY,
+    ):
+        self.path = Path(path)
+        self.root = str(root)
+        self.save_delay = save_delay
+        self.folders: dict = {}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("root") == self.root:
+                self.folders = data.get("folders", {})
+        except (OSError, ValueError):
+            pass
+
+    def mark(self, folder: Path) -> None:
+        try:
+            st = folder.stat()
+        except FileNotFoundError:
+            return self.forget([folder.name])
+        with self._lock:
+            self.folders[folder.name] = [st.st_ino, st.st_mtime_ns]
+            self._schedule()
+
+    def forget(self, names) -> None:
+        with self._lock:
+            for name in names:
+                self.folders.pop(name, None)
+            self._schedule()
+
+    def _schedule(self) -> None:
+        # 调用方持有锁；Timer 不是守护线程，进程退出前仍会写入
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.save)
+            self._timer.start()
+
+    def save(self) -> None:
+        """立即写入快照；序列化与替换都在锁内，每次使用独立的临时文件"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            data = json.dumps({"root": self.root, "folders": self.folders})
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                tmp.write_text(data, encoding="utf-8")
+                os.replace(tmp, self.path)
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                raise
+
+
+class PollingWatcher:
+    """定时对比一级文件夹快照的轮询监听，用于收不到文件系统事件的挂载点"""
+
+    def __init__(self, path: Path, tracker, interval: float = 30) -> None:
+        self.path = path
+        self.tracker = tracker
+        self.interval = interval
+        self.folders = scan_folders(path)
+        self._stop = threading.Event()
+
+    def poll(self) -> None:
+        try:
+            current = scan_folders(self.path)
+        except OSError as e:
+            print(f"[Watcher] Polling {self.path} failed: {e}")
+            return
+        changed, removed = diff_folders(self.folders, current)
+        self.folders = current
+        for name in changed:
+            self.tracker.add(self.path / name)
+        for name in removed:
+            print(f"[Watcher] Folder deleted from watched/: {self.path / name}")
+            self.tracker.discard(self.path / name)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> None:
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def start_watcher(
+    path,
+    callback,
+    settle_seconds: float = 60,
+    interval: float = 5,
+    mode: str = "auto",
+    poll_interval: float = 30,
+    snapshot_path: str | Path = SNAPSHOT_PATH,
+):
+    """监听 path 下新增的一级文件夹，文件夹写入完成（稳定 settle_seconds 秒）后回调
+
+    只监听根目录本身（非递归），文件夹内部的变化由 SettleTracker 定期统计。
+    启动时与上次的快照对比，只上报新增或变化的文件夹。
+    mode: native 使用文件系统事件；polling 定时对比快照；
+          auto 在网络文件系统或事件监听启动失败时使用轮询。
+    """
+    path = Path(path).resolve()
+    snapshot = FolderSnapshot(snapshot_path, path)
+
+    def _report(folder):
+        callback(folder)
+        snapshot.mark(folder)
+
+    tracker = SettleTracker(_report, settle_seconds, interval)
 
     print(f"[Watcher] Performing initial scan for existing folders in {path}")
-    for folder in path.iterdir():
-        if folder.is_dir():
-            print(f"[Watcher] Found existing folder: {folder}")
-            callback(folder)
-
-    observer.schedule(handler, str(path), recursive=True)
-    observer_thread = threading.Thread(target=observer.start, daemon=True)
-    observer_thread.start()
+    changed, removed = diff_folders(snapshot.folders, scan_folders(path))
+    for name in changed:
+        print(f"[Watcher] Found new or changed folder: {path / name}")
+        tracker.add(path / name)
+    if removed:
+        print(f"[Watcher] {len(removed)} folder(s) removed since last run")
+        snapshot.forget(removed)
+
+    if mode == "auto" and (fstype := filesystem_type(path)) in NETWORK_FS:
+        print(f"[Watcher] {path} is on {fstype}, using polling")
+        mode = "polling"
+
+    watcher = None
+    if mode != "polling":
+        observer = Observer()
+        handler = FolderWatcher(path, tracker.add)
+        handler.on_removed = tracker.discard
+        try:
+            observer.schedule(handler, str(path), recursive=False)
+            observer.start()
+            watcher = observer
+        except OSError as e:
+            if mode == "native":
+                raise
+            print(f"[Watcher] Native events unavailable ({e}), using polling")
+
+    if watcher is None:
+        watcher = PollingWatcher(path, tracker, poll_interval)
+        watcher.start()
+
+    tracker.start()
     print(f"[Watcher] Start Monitoring folder: {path}")
 
-    return observer
+    watcher.tracker = tracker
+    return watcher
 
 
 # 1.	启动时对每个 library 路径执行一次全量扫描；
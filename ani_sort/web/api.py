@@ -1,13 +1,17 @@
 from fastapi import FastAPI
 from fastapi.templating import Jinja2Templates
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
 from ani_sort.db import init_db, SessionLocal, get_or_create_watchfolder
 from ani_sort.web.routes import tasks, gallery
 from ani_sort.config_manager import load_config
 from ani_sort.watcher import start_watcher
+from ani_sort.history import HISTORY_DIR, HISTORY_FILE
+from ani_sort.queue import get_job_queue, start_job_workers, stop_job_workers
+from ani_sort import metrics
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-TASKS_FILE = BASE_DIR / "tasks" / "history.json"
+TASKS_FILE = HISTORY_DIR / HISTORY_FILE
 
 app = FastAPI(title="AniSort WebUI", version="0.1")
 templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
@@ -16,9 +20,16 @@ templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
 def on_new_folder(folder_path):
     print(f"Add detected folder: {folder_path}")
     session = SessionLocal()
-    get_or_create_watchfolder(db=session, path=str(folder_path), status="detected")
+    watch = get_or_create_watchfolder(
+        db=session, path=str(folder_path), status="detected"
+    )
     session.commit()
 
+    config = load_config()
+    if config.features.get("auto_sort", False) and watch.status == "detected":
+        get_job_queue(config).enqueue(str(folder_path), watch.id)
+    session.close()
+
 
 @app.on_event("startup")
 def startup_event():
@@ -26,7 +37,26 @@ def startup_event():
     print("Database initialized")
     config = load_config()
     watch_path = Path(config.general.watch_folder)
-    start_watcher(watch_path, on_new_folder)
+    start_watcher(
+        watch_path,
+        on_new_folder,
+        settle_seconds=config.watcher.settle_seconds,
+        interval=config.watcher.interval,
+        mode=config.watcher.mode,
+        poll_interval=config.watcher.poll_interval,
+    )
+    start_job_workers(config)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    stop_job_workers(timeout=5)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus 抓取端点：各阶段耗时直方图与缓存、链接、失败计数"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 app.include_router(tasks.router)
@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from ani_sort.db import SessionLocal, Anime
+from ani_sort.db import get_db, Anime
 from fastapi.templating import Jinja2Templates
+from ani_sort.artwork import get_artwork_store, tmdb_url
+from ani_sort.config_manager import load_config
 
 router = APIRouter(prefix="/gallery", tags=["Gallery"])
 templates = Jinja2Templates(directory="ani_sort/web/templates")
 
 
 @router.get("/", response_class=HTMLResponse)
-def anime_gallery(request: Request):
-    session: Session = SessionLocal()
+def anime_gallery(request: Request, session: Session = Depends(get_db)):
     animes = session.query(Anime).all()
     return templates.TemplateResponse(
         "gallery.html", {"request": request, "animes": animes}
     )
 
 
+@router.get("/artwork/{variant}/{tmdb_path:path}")
+def artwork(variant: str, tmdb_path: str):
+    """本地缓存的海报；TMDB 图片路径本身不会变化，可长期缓存"""
+    tmdb_path = "/" + tmdb_path
+    store = get_artwork_store(load_config())
+    if store is None or (path := store.get(tmdb_path, variant)) is None:
+        return RedirectResponse(tmdb_url(tmdb_path, variant))
+    return FileResponse(
+        path, headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
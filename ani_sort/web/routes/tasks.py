@@ -1,23 +1,43 @@
+import asyncio
+import json
 import threading
-from fastapi import APIRouter, Request, Form, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, RedirectResponse
+from datetime import datetime
+from fastapi import APIRouter, Request, Form, HTTPException, Query, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from ani_sort.db import SessionLocal, Task, WatchedFolder
-from ani_sort.task import run_sort_task
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ani_sort.db import get_db, SessionLocal, Task, WatchedFolder
+from ani_sort.queue import get_job_queue
+from ani_sort.history import get_history
+from ani_sort.config_manager import load_config
 
 
 router = APIRouter(tags=["Tasks"])
 templates = Jinja2Templates(directory="ani_sort/web/templates")
 
 
+PAGE_SIZE = 50
+EVENT_INTERVAL = 1.0  # 事件流轮询数据库的间隔（秒）
+KEEPALIVE_INTERVAL = 15
+
+
 @router.get("/", response_class=HTMLResponse)
-def list_tasks(request: Request):
-    db = SessionLocal()
-    tasks = db.query(Task).order_by(Task.id.desc()).all()
-    running_tasks = db.query(Task).filter(Task.status == "running").all()
+def list_tasks(
+    request: Request, before: int | None = None, db: Session = Depends(get_db)
+):
+    tasks = _task_page(db, before=before, limit=PAGE_SIZE)
+    running_tasks = (
+        db.query(Task).filter(Task.status == "running").limit(PAGE_SIZE).all()
+    )
     pending_tasks = (
-        db.query(WatchedFolder).filter(WatchedFolder.status == "detected").all()
-    )  # detected, processing, processed, removed
+        db.query(WatchedFolder)
+        .filter(WatchedFolder.status == "detected")
+        .order_by(WatchedFolder.id.desc())
+        .limit(PAGE_SIZE)
+        .all()
+    )  # detected, queued, processing, processed, removed
     return templates.TemplateResponse(
         "task.html",
         {
@@ -25,23 +45,184 @@ def list_tasks(request: Request):
             "tasks": tasks,
             "pending": pending_tasks,
             "running": running_tasks,
+            "next_before": tasks[-1].id if len(tasks) == PAGE_SIZE else None,
         },
     )
 
 
-def long_sort_task(folder_path: str):
-    print(f"Sorting started for {folder_path}")
-    run_sort_task(input_path=folder_path)
-    print(f"Sorting completed for {folder_path}")
+def _task_page(
+    db: Session,
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before: int | None = None,
+    limit: int = PAGE_SIZE,
+) -> list[Task]:
+    """按 ID 倒序的键集分页：before 为上一页最后一条的 ID"""
+    query = db.query(Task)
+    if status:
+        query = query.filter(Task.status == status)
+    if since:
+        query = query.filter(Task.started_at >= since)
+    if until:
+        query = query.filter(Task.started_at < until)
+    if before:
+        query = query.filter(Task.id < before)
+    return query.order_by(Task.id.desc()).limit(limit).all()
+
+
+def _task_dict(task: Task) -> dict:
+    return {
+        "id": task.id,
+        "anime_id": task.anime_id,
+        "input_path": task.input_path,
+        "output_path": task.output_path,
+        "status": task.status,
+        "started_at": task.started_at.isoformat() if task.started_at else None,
+        "ended_at": task.ended_at.isoformat() if task.ended_at else None,
+        "error_msg": task.error_msg,
+        "timings": task.timings,
+    }
+
+
+def _folder_dict(folder: WatchedFolder) -> dict:
+    return {
+        "id": folder.id,
+        "path": folder.path,
+        "status": folder.status,
+        "detected_at": folder.detected_at.isoformat() if folder.detected_at else None,
+        "task_id": folder.task_id,
+    }
+
+
+@router.get("/api/tasks")
+def api_tasks(
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before: int | None = Query(None, description="上一页返回的 next_before"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    tasks = _task_page(db, status, since, until, before, limit)
+    return {
+        "items": [_task_dict(t) for t in tasks],
+        "next_before": tasks[-1].id if len(tasks) == limit else None,
+    }
+
+
+@router.get("/api/folders")
+def api_folders(
+    status: str | None = None,
+    since: datetime | None = None,
+    before: int | None = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    query = db.query(WatchedFolder)
+    if status:
+        query = query.filter(WatchedFolder.status == status)
+    if since:
+        query = query.filter(WatchedFolder.detected_at >= since)
+    if before:
+        query = query.filter(WatchedFolder.id < before)
+    folders = query.order_by(WatchedFolder.id.desc()).limit(limit).all()
+    return {
+        "items": [_folder_dict(f) for f in folders],
+        "next_before": folders[-1].id if len(folders) == limit else None,
+    }
+
+
+def _poll_task_changes(last_id: int, watching: dict) -> tuple[int, dict, list]:
+    """查询新任务与执行中任务的状态变化，返回 (最大 ID, 仍在执行的任务, 变化列表)"""
+    with SessionLocal() as db:
+        rows = (
+            db.query(Task)
+            .filter(or_(Task.id > last_id, Task.id.in_(list(watching))))
+            .order_by(Task.id)
+            .all()
+        )
+        changes = [
+            _task_dict(t)
+            for t in rows
+            if t.id > last_id or watching.get(t.id) != t.status
+        ]
+    last_id = max([last_id] + [c["id"] for c in changes])
+    watching = {**watching, **{c["id"]: c["status"] for c in changes}}
+    watching = {k: v for k, v in watching.items() if v == "running"}
+    return last_id, watching, changes
+
+
+@router.get("/api/events")
+async def task_events(request: Request):
+    """任务状态变化的 Server-Sent Events 流（事件名 task，数据为任务 JSON）"""
+
+    def _initial():
+        with SessionLocal() as db:
+            last_id = db.query(func.max(Task.id)).scalar() or 0
+            running = db.query(Task.id).filter(Task.status == "running").all()
+        return last_id, {tid: "running" for (tid,) in running}
+
+    async def _stream():
+        last_id, watching = await run_in_threadpool(_initial)
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            await asyncio.sleep(EVENT_INTERVAL)
+            last_id, watching, changes = await run_in_threadpool(
+                _poll_task_changes, last_id, watching
+            )
+            for change in changes:
+                yield f"event: task\ndata: {json.dumps(change, ensure_ascii=False)}\n\n"
+            idle = 0.0 if changes else idle + EVENT_INTERVAL
+            if idle >= KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/tasks/{task_id}", response_class=HTMLResponse)
+def task_detail(request: Request, task_id: str):
+    task = get_history(load_config()).get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return templates.TemplateResponse("detail.html", {"request": request, "task": task})
+
+
+@router.get("/api/history")
+def query_history(
+    status: str | None = None,
+    anime: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    history = get_history(load_config())
+    return {
+        "total": history.count(status=status, anime=anime),
+        "items": history.query(status=status, anime=anime, limit=limit, offset=offset),
+    }
 
 
 @router.post("/run")
-def run_task_from_web(background_tasks: BackgroundTasks, folder_id: int = Form(...)):
-    db = SessionLocal()
+def run_task_from_web(
+    folder_id: int = Form(...),
+    priority: int = Form(0),
+    db: Session = Depends(get_db),
+):
     folder = db.query(WatchedFolder).filter_by(id=folder_id).first()
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    background_tasks.add_task(long_sort_task, folder.path)
+    get_job_queue(load_config()).enqueue(folder.path, folder.id, priority)
 
     return RedirectResponse("/", status_code=303)
+
+
+@router.get("/api/queue")
+def queue_stats():
+    return get_job_queue(load_config()).stats()
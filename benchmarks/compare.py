@@ -0,0 +1,50 @@
+"""对比两次基准结果（startup 或 pipeline 的 JSON 输出）
+
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+# 参与对比的耗时字段
+METRICS = ("median_s", "wall_ms", "import_ms")
+
+
+def flatten(data, prefix=""):
+    """把嵌套结果展开为 {路径: 数值}，只保留耗时字段"""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif key in METRICS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold", type=float, default=0.05, help="Ignore changes below 5%%"
+    )
+    args = parser.parse_args(argv)
+
+    before = flatten(json.loads(Path(args.before).read_text(encoding="utf-8")))
+    after = flatten(json.loads(Path(args.after).read_text(encoding="utf-8")))
+
+    for path in sorted(before.keys() & after.keys()):
+        old, new = before[path], after[path]
+        change = (new - old) / old if old else 0.0
+        mark = ""
+        if change <= -args.threshold:
+            mark = "faster"
+        elif change >= args.threshold:
+            mark = "SLOWER"
+        print(f"{path:55} {old:12.4f} -> {new:12.4f}  {change:+7.1%}  {mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""整理流程基准
+
+在 tmpfs（默认 /dev/shm）中生成合成的发布文件夹，替换 TMDB/AI 调用后分阶段计时：
+
+    walk       get_all_files 遍历输入文件夹
+    init       AniSort 初始化（元数据替身 + 所有文件规范化）
+    parse      AniSort.parse 逐个解析文件名
+    normalize  AniSort.normalize 逐个生成目标路径
+    process    AniSort.process 硬链接到输出目录
+    rerun      同一输出目录再次整理（增量清单命中）
+    subset     subset_ass_fonts（需要 assfonts，否则跳过）
+
+    python -m benchmarks.pipeline --sizes 10 1000 50000 -o after.json
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from benchmarks import stubs
+from benchmarks.synthetic import make_library
+
+ROOT = Path(__file__).resolve().parent.parent
+STAGES = ["walk", "init", "parse", "normalize", "process", "rerun", "subset"]
+
+
+def _default_workdir() -> str:
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return str(shm)
+    return tempfile.gettempdir()
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_size(n_files: int, repeat: int, workdir: Path, config, logger) -> dict:
+    from ani_sort.core import AniSort
+    from ani_sort.utils import get_all_files
+    from ani_sort.subset import subset_ass_fonts
+
+    base = Path(tempfile.mkdtemp(prefix=f"anisort-bench-{n_files}-", dir=workdir))
+    try:
+        start = time.perf_counter()
+        folders = make_library(base / "input", n_files)
+        generate_s = time.perf_counter() - start
+        files = sum(len(get_all_files(f)) for f in folders)
+
+        samples: dict = {stage: [] for stage in STAGES}
+        for r in range(repeat):
+            out = base / f"output-{r}"
+            samples["walk"].append(_timed(lambda: [get_all_files(f) for f in folders]))
+
+            sorters = []
+            samples["init"].append(
+                _timed(
+                    lambda: sorters.extend(
+                        AniSort(f, out, config, logger) for f in folders
+                    )
+                )
+            )
+            paths = [(s, Path(src)) for s in sorters for src in s.table]
+            samples["parse"].append(_timed(lambda: [s.parse(p.name) for s, p in paths]))
+            samples["normalize"].append(
+                _timed(lambda: [s.normalize(p) for s, p in paths])
+            )
+            samples["process"].append(
+                _timed(lambda: [s.process(dryrun=False) for s in sorters])
+            )
+            samples["rerun"].append(
+                _timed(
+                    lambda: [
+                        AniSort(f, out, config, logger).process(dryrun=False)
+                        for f in folders
+                    ]
+                )
+            )
+
+        if shutil.which("assfonts"):
+            target = base / "output-0"
+            samples["subset"].append(
+                _timed(lambda: subset_ass_fonts(target, logger=logger, workers=4))
+            )
+
+        stages = {}
+        for stage, values in samples.items():
+            if not values:
+                stages[stage] = {"skipped": True}
+                continue
+            median = statistics.median(values)
+            stages[stage] = {
+                "median_s": round(median, 6),
+                "min_s": round(min(values), 6),
+                "per_file_us": round(median / max(files, 1) * 1e6, 3),
+            }
+        return {
+            "files": files,
+            "folders": len(folders),
+            "generate_s": round(generate_s, 3),
+            "stages": stages,
+        }
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline AniSort pipeline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "--workdir",
+        default=_default_workdir(),
+        help="Where synthetic folders are created (default: /dev/shm)",
+    )
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    from ani_sort.config_manager import load_config
+
+    config = load_config(force=True)
+    logger = logging.getLogger("AniSort.benchmark")
+    logger.propagate = False
+    logger.setLevel(logging.WARNING)
+
+    workdir = Path(args.workdir)
+    history_dir = Path(tempfile.mkdtemp(prefix="anisort-bench-history-", dir=workdir))
+    stubs.install(config, history_dir)
+
+    results = {
+        "benchmark": "pipeline",
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    try:
+        for n in args.sizes:
+            r = results["sizes"][str(n)] = run_size(
+                n, args.repeat, workdir, config, logger
+            )
+            print(f"== {r['files']} files in {r['folders']} folder(s)")
+            for stage, t in r["stages"].items():
+                if t.get("skipped"):
+                    print(f"   {stage:10} skipped")
+                else:
+                    print(
+                        f"   {stage:10} {t['median_s'] * 1000:10.2f} ms"
+                        f"  {t['per_file_us']:9.2f} us/file"
+                    )
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return results
+
+
+if __name__ == "__main__":
+    main()
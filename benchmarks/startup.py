@@ -0,0 +1,103 @@
+"""CLI 启动耗时基准
+
+用 `python -X importtime` 统计各入口的导入耗时，并测量 `main.py --help` 的总耗时。
+
+    python -m benchmarks.startup                 # 打印结果
+    python -m benchmarks.startup -o startup.json # 同时写入 JSON，便于前后对比
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 入口：名称 -> python 参数
+TARGETS = {
+    "cli_help": ["main.py", "--help"],
+    "import_task": ["-c", "import ani_sort.task"],
+    "import_core": ["-c", "import ani_sort.core"],
+    "import_config": ["-c", "import ani_sort.config_manager"],
+    "import_db": ["-c", "import ani_sort.db"],
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """解析 -X importtime 输出：[(模块, 缩进层级, 累计微秒)]"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if cumulative.strip().isdigit():
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            records.append((name.strip(), depth, int(cumulative)))
+    return records
+
+
+def measure(args: list[str], repeat: int, top: int) -> dict:
+    walls, totals, last = [], [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        walls.append(time.perf_counter() - start)
+        records = parse_importtime(proc.stderr)
+        # 顶层导入的累计耗时之和即总导入耗时
+        totals.append(sum(us for _, depth, us in records if depth == 0))
+        last = {name: us for name, _, us in records}
+
+    heaviest = sorted(last.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "wall_ms": round(statistics.median(walls) * 1000, 2),
+        "import_ms": round(statistics.median(totals) / 1000, 2),
+        "heavy_modules": {
+            "sqlalchemy": "sqlalchemy" in last,
+            "pydantic": "pydantic" in last,
+            "requests": "requests" in last,
+            "yaml": "yaml" in last,
+        },
+        "top_modules_ms": {name: round(us / 1000, 2) for name, us in heaviest},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure AniSort startup cost")
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest modules to keep")
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    parser.add_argument("targets", nargs="*", help=f"Any of: {', '.join(TARGETS)}")
+    args = parser.parse_args(argv)
+    if unknown := set(args.targets) - set(TARGETS):
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    results = {
+        "benchmark": "startup",
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+    for name in args.targets or TARGETS:
+        r = results["results"][name] = measure(TARGETS[name], args.repeat, args.top)
+        loaded = ", ".join(k for k, v in r["heavy_modules"].items() if v) or "-"
+        print(
+            f"{name:15} wall {r['wall_ms']:8.1f} ms  "
+            f"imports {r['import_ms']:8.1f} ms  heavy: {loaded}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""本地的 TMDB / AI 替身，基准测试不访问网络，也不写入仓库内的缓存与历史"""
+
+import re
+import zlib
+import ani_sort.history
+import ani_sort.metadata
+from ani_sort.history import TaskHistory
+
+
+def _tmdb_id(text: str) -> int:
+    return zlib.crc32(text.casefold().encode("utf-8")) % 1_000_000
+
+
+def fake_call_tmdb(api_key, url, params=None, proxies=None, logger=None, **kwargs):
+    """按 URL 返回固定结构的 TMDB 响应"""
+    params = params or {}
+    if "/search/" in url:
+        query = params.get("query", "")
+        return {
+            "results": [
+                {
+                    "id": _tmdb_id(query),
+                    "name": query,
+                    "original_name": query,
+                    "first_air_date": "2020-01-01",
+                    "poster_path": f"/{_tmdb_id(query)}.jpg",
+                    "backdrop_path": None,
+                    "media_type": "tv",
+                }
+            ]
+        }
+    if m := re.search(r"/tv/(\d+)/season/(\d+)/images", url):
+        return {"posters": [{"file_path": f"/{m[1]}_s{m[2]}.jpg"}]}
+    if m := re.search(r"/tv/(\d+)$", url):
+        data = {"seasons": [{"name": f"第 {n} 季"} for n in range(1, 4)]}
+        for item in filter(None, params.get("append_to_response", "").split(",")):
+            n = item.split("/")[1]
+            data[item] = {"posters": [{"file_path": f"/{m[1]}_s{n}.jpg"}]}
+        return data
+    return {}
+
+
+def fake_call_ai(config):
+    """第一个提示返回文件夹名本身，第二个提示（季数）返回 1"""
+
+    def _call_ai(api_key, content, client=None):
+        if content.endswith(config.ai.prompt2):
+            return "1"
+        return content.split("\n\n", 1)[0]
+
+    return _call_ai
+
+
+def install(config, history_dir) -> None:
+    """替换网络调用，关闭缓存与 AI 记忆，任务历史写入 history_dir"""
+    ani_sort.metadata.call_tmdb = fake_call_tmdb
+    ani_sort.metadata.call_ai = fake_call_ai(config)
+    ani_sort.history._history = TaskHistory(history_dir)
+    config.tmdb.api = "stub"
+    config.tmdb.cache = False
+    config.tmdb.manual = False
+    config.ai.memo = False
+    config.library.enabled = False
+    config.artwork.enabled = False
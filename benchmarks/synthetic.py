@@ -0,0 +1,138 @@
+"""合成的 BD 发布文件夹
+
+按 pattern_rules.yaml 针对的命名风格生成文件：[01] / SxxEyy / 空格分隔集数正片，
+SC/TC 字幕，NCOP/NCED、Menu、IV、PV/CM 特典，CD 与扫图。视频文件为空文件，
+字幕文件为可被 assfonts 处理的最小 ASS。
+"""
+
+import random
+from pathlib import Path
+
+GROUPS = ["VCB-Studio", "Nekomoe kissaten", "LoliHouse", "Sakurato", "Snow-Raws"]
+TITLES = [
+    "Yuru Camp",
+    "Bocchi the Rock",
+    "Spy x Family",
+    "Kusuriya no Hitorigoto",
+    "Sousou no Frieren",
+    "Hibike Euphonium",
+    "Made in Abyss",
+    "Violet Evergarden",
+]
+TAGS = "[Ma10p_1080p][x265_flac]"
+
+ASS_TEMPLATE = """[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Source Han Sans SC,60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,1,2,0,2,10,10,10,1
+Style: Sign,FZLanTingHei-DB-GBK,48,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,0,8,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+{events}
+"""
+LINES = [
+    "今天也是好天气",
+    "我们去露营吧",
+    "这是第{ep}集",
+    "{{\\fnSimHei}}标题",
+    "谢谢观看",
+]
+
+# 名称风格：episode 文件名模板（{t} 标题，{g} 字幕组，{s} 季，{e} 集）
+EPISODE_STYLES = {
+    "bracket": "[{g}] {t} [{e:02d}]" + TAGS,
+    "sxxeyy": "[{g}] {t} S{s:02d}E{e:02d} [1080p]",
+    "space": "[{g}] {t} {e:02d} [1080p]",
+}
+EXTRAS = [
+    "SPs/[{g}] {t} [NCOP{n}]" + TAGS + ".mkv",
+    "SPs/[{g}] {t} [NCED{n}]" + TAGS + ".mkv",
+    "SPs/[{g}] {t} [Menu{n}]" + TAGS + ".mkv",
+    "SPs/[{g}] {t} [IV{n:02d}]" + TAGS + ".mkv",
+    "SPs/[{g}] {t} [PV{n}]" + TAGS + ".mkv",
+    "SPs/[{g}] {t} [CM{n:02d}]" + TAGS + ".mkv",
+]
+
+
+def _ass(ep: int, rng: random.Random) -> str:
+    events = "\n".join(
+        f"Dialogue: 0,0:00:{i:02d}.00,0:00:{i + 1:02d}.00,"
+        f"{'Sign' if i % 4 == 0 else 'Default'},,0,0,0,,"
+        + rng.choice(LINES).format(ep=ep)
+        for i in range(20)
+    )
+    return ASS_TEMPLATE.format(events=events)
+
+
+def make_release(
+    root: Path,
+    title: str,
+    group: str,
+    episodes: int,
+    season: int = 1,
+    style: str = "bracket",
+    rng: random.Random | None = None,
+) -> tuple[Path, int]:
+    """生成一个发布文件夹，返回 (文件夹路径, 文件数)"""
+    rng = rng or random.Random(0)
+    name = f"[{group}] {title}"
+    if season > 1:
+        name += f" S{season}"
+    folder = root / f"{name} [Ma10p_1080p]"
+    files = []
+
+    template = EPISODE_STYLES[style]
+    for ep in range(1, episodes + 1):
+        stem = template.format(g=group, t=title, s=season, e=ep)
+        files.append((f"{stem}.mkv", None))
+        files.append((f"{stem}.mka", None))
+        files.append((f"{stem}.sc.ass", _ass(ep, rng)))
+        files.append((f"{stem}.tc.ass", _ass(ep, rng)))
+
+    for n in range(1, max(2, episodes // 6) + 1):
+        for extra in EXTRAS:
+            files.append((extra.format(g=group, t=title, n=n), None))
+
+    cd = f"CDs/[{group}] {title} OST CD{1:02d}"
+    for track in range(1, 13):
+        files.append((f"{cd}/{track:02d}.flac", None))
+    files.append((f"{cd}/cover.jpg", None))
+    for scan in range(1, 9):
+        files.append((f"Scans/{scan:02d}.jpg", None))
+
+    for rel, content in files:
+        path = folder / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if content is None:
+            path.touch()
+        else:
+            path.write_text(content, encoding="utf-8")
+    return folder, len(files)
+
+
+def make_library(root: Path, n_files: int, seed: int = 0) -> list[Path]:
+    """生成总文件数约为 n_files 的多个发布文件夹（至少一个）"""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    folders, total, i = [], 0, 0
+    while total < n_files:
+        remaining = n_files - total
+        # 每集 4 个文件，加上特典/CD/扫图约 33 个
+        episodes = max(1, min(rng.choice([12, 13, 24, 26]), (remaining - 30) // 4))
+        title = TITLES[i % len(TITLES)] + (f" {i // len(TITLES) + 1}" if i else "")
+        folder, count = make_release(
+            root,
+            title,
+            GROUPS[i % len(GROUPS)],
+            episodes,
+            season=1 + (i // len(TITLES)) % 3,
+            style=list(EPISODE_STYLES)[i % len(EPISODE_STYLES)],
+            rng=rng,
+        )
+        folders.append(folder)
+        total += count
+        i += 1
+    return folders
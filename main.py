@@ -1,6 +1,8 @@
 import argparse
-from ani_sort.task import run_sort_task
-from ani_sort.db import SessionLocal, Anime, Task, init_db
+import os
+import sys
+
+# ani_sort.task / ani_sort.db 会导入 SQLAlchemy、pydantic 等，参数解析完成后再导入
 
 
 def main():
@@ -18,6 +20,9 @@ def main():
     )
     args = parser.parse_args()
 
+    from ani_sort.db import init_db
+    from ani_sort.task import run_sort_task
+
     # database
     init_db()
 
@@ -33,5 +38,219 @@ def main():
     print(f"Run sort task: {status}")
 
 
+def batch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py batch", description="Sort many input folders in parallel"
+    )
+    parser.add_argument("inputs", nargs="+", help="Input folder paths")
+    parser.add_argument("-o", "--output", help="Optional output folder path")
+    parser.add_argument(
+        "--parent",
+        action="store_true",
+        help="Treat inputs as parent directories and sort each subfolder",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=4, help="Concurrent tasks (default: 4)"
+    )
+    parser.add_argument(
+        "--link-workers",
+        type=int,
+        default=1,
+        help="Tasks allowed to link/move/subset at the same time (default: 1)",
+    )
+    parser.add_argument(
+        "--dryrun", action="store_true", help="Preview only, no changes"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show detailed logs")
+    parser.add_argument(
+        "--move",
+        action="store_true",
+        help="Move the original input folders to a designated location after sorting",
+    )
+    args = parser.parse_args(argv)
+
+    from ani_sort.db import init_db
+    from ani_sort.task import run_batch_tasks, expand_batch_inputs
+
+    init_db()
+
+    inputs = expand_batch_inputs(args.inputs, from_parent=args.parent)
+    summary = run_batch_tasks(
+        inputs,
+        args.output,
+        workers=args.workers,
+        link_workers=args.link_workers,
+        dryrun=args.dryrun,
+        verbose=args.verbose,
+        move=args.move,
+    )
+
+    for r in summary["results"]:
+        line = f"[{r['status'].upper():7}] {r['duration']:7.2f}s  {r['input']}"
+        if r.get("error"):
+            line += f"\n           {r['error']}"
+        print(line)
+    print(
+        f"Batch finished: {summary['success']}/{summary['total']} succeeded, "
+        f"{summary['failed']} failed in {summary['duration']:.2f}s"
+    )
+    return 1 if summary["failed"] else 0
+
+
+def plan_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py plan",
+        description="Resolve metadata and write a sort plan without touching files",
+    )
+    parser.add_argument("input", help="Input folder path")
+    parser.add_argument("output", nargs="?", help="Optional output folder path")
+    parser.add_argument(
+        "-o",
+        "--plan",
+        default="plan.json",
+        help="Plan file to write, gzipped if it ends with .gz (default: plan.json)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show detailed logs")
+    args = parser.parse_args(argv)
+
+    from ani_sort.config_manager import load_config
+    from ani_sort.core import AniSort
+    from ani_sort.logging import setup_logger
+    from ani_sort.plan import build_plan, write_plan
+
+    config = load_config()
+    sorter = AniSort(args.input, args.output, config, setup_logger(args.verbose))
+    plan = build_plan(sorter)
+    write_plan(plan, args.plan)
+
+    linked = sum(1 for _, dest, _ in plan["files"] if dest != "ignore")
+    print(
+        f"Plan written to {args.plan}: {sorter.ani_name}, "
+        f"{linked} file(s) to link into {sorter.parent_dir}"
+    )
+    return 0
+
+
+def apply_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py apply",
+        description="Execute a sort plan offline, verifying sources first",
+    )
+    parser.add_argument("plan", help="Plan file written by `main.py plan`")
+    parser.add_argument("--input", help="Input folder path if it moved since planning")
+    parser.add_argument("-o", "--output", help="Output folder path override")
+    parser.add_argument(
+        "--skip-changed",
+        action="store_true",
+        help="Skip sources modified since planning instead of failing",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show detailed logs")
+    parser.add_argument(
+        "--move",
+        action="store_true",
+        help="Move the original input folder to a designated location after sorting",
+    )
+    args = parser.parse_args(argv)
+
+    from ani_sort.db import init_db
+    from ani_sort.plan import read_plan
+    from ani_sort.task import run_sort_task
+
+    plan = read_plan(args.plan)
+    init_db()
+
+    status = run_sort_task(
+        input_path=args.input or plan["input"],
+        output_dir=args.output,
+        verbose=args.verbose,
+        move=args.move,
+        is_cli=True,
+        plan=plan,
+        skip_changed=args.skip_changed,
+    )["status"]
+    print(f"Apply plan: {status}")
+    return 0
+
+
+def tmdb_index_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py tmdb-index",
+        description="Build and query the local TMDB title index",
+    )
+    sub = parser.add_subparsers(dest="action", required=True)
+    p_import = sub.add_parser("import", help="Import a daily TMDB ID export")
+    p_import.add_argument(
+        "source", nargs="?", help="Export file path or URL (*.json.gz or *.json)"
+    )
+    p_import.add_argument(
+        "--download",
+        choices=["tv", "movie"],
+        help="Stream yesterday's export of this type from files.tmdb.org",
+    )
+    p_import.add_argument(
+        "--type",
+        choices=["tv", "movie"],
+        help="Media type of the export (default: guessed from the file name)",
+    )
+    p_search = sub.add_parser("search", help="Search the local index")
+    p_search.add_argument("query")
+    p_search.add_argument("-n", "--limit", type=int, default=10)
+    sub.add_parser("stats", help="Show imported exports")
+    args = parser.parse_args(argv)
+
+    from ani_sort.config_manager import load_config
+    from ani_sort.tmdb_index import (
+        TitleIndex,
+        export_url,
+        guess_media_type,
+        open_export,
+    )
+
+    config = load_config()
+    index = TitleIndex(config.tmdb.index_path)
+
+    if args.action == "import":
+        if args.download:
+            source, media_type = export_url(args.download), args.download
+        elif args.source:
+            source = args.source
+            media_type = args.type or guess_media_type(source)
+        else:
+            parser.error("import needs a source or --download")
+        if media_type is None:
+            parser.error("cannot guess the media type, pass --type")
+        rows = index.import_export(open_export(source, config), media_type, source)
+        print(f"Imported {rows} {media_type} titles from {source}")
+    elif args.action == "search":
+        for r in index.search(args.query, args.limit):
+            title = r.get("name") or r.get("title")
+            print(f"{r['id']:>8}  {r['media_type']:5}  {r['popularity']:8.2f}  {title}")
+    else:
+        for media_type, info in index.stats.items():
+            print(
+                f"{media_type:5} {info['rows']:>9} rows  imported {info['imported_at']}"
+            )
+    return 0
+
+
+COMMANDS = {
+    "batch": batch_main,
+    "plan": plan_main,
+    "apply": apply_main,
+    "tmdb-index": tmdb_index_main,
+}
+
+
+def _command(argv) -> str | None:
+    """第一个参数是子命令名且不是已存在的路径时返回子命令
+    与子命令同名的文件夹照常整理；用 "--" 分隔时也总是按路径处理
+    """
+    if argv and argv[0] in COMMANDS and not os.path.exists(argv[0]):
+        return argv[0]
+    return None
+
+
 if __name__ == "__main__":
+    if command := _command(sys.argv[1:]):
+        sys.exit(COMMANDS[command](sys.argv[2:]))
     main()
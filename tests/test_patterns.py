@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from ani_sort.patterns import PatternEngine
+
+RULES = Path(__file__).resolve().parent.parent / "config" / "pattern_rules.yaml"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    data = yaml.safe_load(RULES.read_text(encoding="utf-8"))
+    return PatternEngine(data["patterns"], data.get("order", "file"))
+
+
+def full_scan(engine, name):
+    """不经预筛逐条顺序匹配，作为对照"""
+    for rule in engine.rules:
+        if m := rule.regex.search(name):
+            return rule, m
+    return None
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "[Grp] Show [01][Ma10p_1080p].mkv",
+        "[Grp] Show İV - 01.mkv",
+        "[Grp] Show [İV01].mkv",
+        "[Grp] Show [Menu01].mkv",
+        "[Grp] Show [ſP02].mkv",
+        "[Grp] Show [KCM01].mkv",
+        "[Grp] Show ınterview.mkv",
+        "[Grp] Show [NCOP1_EP02].mkv",
+    ],
+)
+def test_prefilter_matches_full_scan(engine, name):
+    expected = full_scan(engine, name)
+    actual = engine.match(name)
+    if expected is None:
+        assert actual is None
+    else:
+        assert actual is not None
+        assert actual[0] is expected[0]
+        assert actual[1].span() == expected[1].span()
@@ -0,0 +1,20 @@
+from ani_sort.plan import _unchanged
+
+# fingerprint(): [设备号, inode, 大小, 修改时间 (ns)]
+PLANNED = [4096, 1_700_000_000_123_456_789]
+
+
+def test_mtime_below_one_second_is_unchanged():
+    # 另一台机器经 SMB 挂载，修改时间只有 100ns 精度
+    assert _unchanged(PLANNED, [1, 2, 4096, 1_700_000_000_123_456_700])
+    assert _unchanged(PLANNED, [1, 2, 4096, 1_700_000_000_000_000_000])
+
+
+def test_size_or_whole_second_change_is_changed():
+    assert not _unchanged(PLANNED, [1, 2, 4097, 1_700_000_000_123_456_789])
+    assert not _unchanged(PLANNED, [1, 2, 4096, 1_700_000_001_123_456_789])
+
+
+def test_missing_source_is_changed():
+    assert not _unchanged(PLANNED, None)
+    assert not _unchanged(None, [1, 2, 4096, 1_700_000_000_123_456_789])
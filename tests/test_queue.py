@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import ani_sort.queue
+from ani_sort.db import Base, Job, WatchedFolder
+from ani_sort.queue import JobQueue, JobWorkerPool
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'anisort.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(ani_sort.queue, "SessionLocal", factory)
+    return factory
+
+
+def _failing_runner(job):
+    raise RuntimeError("sorter failed")
+
+
+def test_failed_job_releases_watched_folder(session_factory):
+    with session_factory() as db:
+        folder = WatchedFolder(path="/in/[Grp] Show", status="detected")
+        db.add(folder)
+        db.commit()
+        folder_id = folder.id
+
+    queue = JobQueue()
+    job_id, created = queue.enqueue("/in/[Grp] Show", folder_id)
+    assert created
+
+    pool = JobWorkerPool(queue, runner=_failing_runner)
+    job = queue.claim("w-0")
+    pool._execute(job, "w-0")
+
+    with session_factory() as db:
+        assert db.get(Job, job_id).status == "failed"
+        assert db.get(Job, job_id).error_msg == "sorter failed"
+        assert db.get(WatchedFolder, folder_id).status == "detected"
+
+    # 可以重新入队
+    assert queue.enqueue("/in/[Grp] Show", folder_id)[1]